@@ -7,9 +7,11 @@ from __future__ import absolute_import
 import numpy as np
 import pandas as pd
 import sklearn
+import sklearn.externals.joblib
 import nolds
-import mne
+import os
 import biosppy
+import time as builtin_time
 
 from .bio_ecg_preprocessing import *
 from .bio_rsp import *
@@ -24,7 +26,7 @@ from ..statistics import *
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_band=u"bandpass", filter_frequency=[3, 45], segmenter=u"hamilton", quality_model=u"default", hrv_features=[u"time", u"frequency", u"nonlinear"], age=None, sex=None, position=None):
+def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_band=u"bandpass", filter_frequency=[3, 45], segmenter=u"hamilton", quality_model=u"default", hrv_features=[u"time", u"frequency", u"nonlinear"], age=None, sex=None, position=None, output=u"dense"):
     u"""
     Automated processing of ECG and RSP signals.
 
@@ -54,6 +56,8 @@ def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_ba
         Subject's gender ("m" or "f") for adjusted HRV.
     position : str
         Recording position. To compare with data from Voss et al. (2015), use "supine".
+    output : str
+        "dense" (default) returns the signals ("df") as a DataFrame. "sparse" returns them as a :class:`neurokit.SparseSignals` object, storing the events (R-peaks, systoles) and the low-rate series (heart rate, RR intervals, HRV bands, RSA) as compact arrays, and materializing their columns on request. Recommended for long (e.g., 24 hours) recordings.
 
     Returns
     ----------
@@ -112,7 +116,8 @@ def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_ba
                                    filter_type=filter_type,
                                    filter_band=filter_band,
                                    filter_frequency=filter_frequency,
-                                   segmenter=segmenter)
+                                   segmenter=segmenter,
+                                   output=output)
 
     # Signal quality
     # ===============
@@ -124,9 +129,12 @@ def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_ba
     # HRV
     # =============
     if hrv_features is not None:
-        hrv = ecg_hrv(processed_ecg[u"ECG"][u"R_Peaks"], sampling_rate, hrv_features=hrv_features)
+        hrv = ecg_hrv(processed_ecg[u"ECG"][u"R_Peaks"], sampling_rate, hrv_features=hrv_features, dense=True if output == u"dense" else output)
         try:
-            processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], hrv.pop(u"df")], axis=1)
+            if output == u"sparse":
+                processed_ecg[u"df"].update(hrv.pop(u"df"))
+            else:
+                processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], hrv.pop(u"df")], axis=1)
         except KeyError:
             pass
         processed_ecg[u"ECG"][u"HRV"] = hrv
@@ -138,13 +146,20 @@ def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_ba
     if rsp is not None:
         rsp = rsp_process(rsp=rsp, sampling_rate=sampling_rate)
         processed_ecg[u"RSP"] = rsp[u"RSP"]
-        processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], rsp[u"df"]], axis=1)
+        if output == u"sparse":
+            for column in rsp[u"df"]:
+                processed_ecg[u"df"].add_signal(column, rsp[u"df"][column].values)
+        else:
+            processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], rsp[u"df"]], axis=1)
 
         # RSA
         # =============
-        rsa = ecg_rsa(processed_ecg[u"ECG"][u"R_Peaks"], rsp[u"df"][u"RSP_Filtered"], sampling_rate=sampling_rate)
+        rsa = ecg_rsa(processed_ecg[u"ECG"][u"R_Peaks"], rsp[u"df"][u"RSP_Filtered"], sampling_rate=sampling_rate, dense=True if output == u"dense" else output)
         processed_ecg[u"ECG"][u"RSA"] = rsa
-        processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], rsa.pop(u"df")], axis=1)
+        if output == u"sparse":
+            processed_ecg[u"df"].update(rsa.pop(u"df"))
+        else:
+            processed_ecg[u"df"] = pd.concat([processed_ecg[u"df"], rsa.pop(u"df")], axis=1)
 
     return(processed_ecg)
 
@@ -165,7 +180,7 @@ def ecg_process(ecg, rsp=None, sampling_rate=1000, filter_type=u"FIR", filter_ba
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def ecg_rsa(rpeaks, rsp, sampling_rate=1000):
+def ecg_rsa(rpeaks, rsp, sampling_rate=1000, dense=True):
     u"""
     Returns Respiratory Sinus Arrhythmia (RSA) features. Only the Peak-to-trough (P2T) algorithm is currently implemented (see details).
 
@@ -177,6 +192,8 @@ def ecg_rsa(rpeaks, rsp, sampling_rate=1000):
         Filtered RSP signal.
     sampling_rate : int
         Sampling rate (samples/second).
+    dense : bool or str
+        If True (default), returns in "df" the RSP signal and the RSA (values of each respiratory cycle and their interpolation) at `sampling_rate`. If "sparse", returns them as a :class:`neurokit.SparseSignals` object, storing the RSA values of each cycle and materializing the columns on request.
 
 
     Returns
@@ -258,28 +275,14 @@ def ecg_rsa(rpeaks, rsp, sampling_rate=1000):
     value_times=(np.array(rsp_cycle_center))
     value_times = np.delete(value_times, NaNs_indices)  # delete also the artifacts from times indices
 
-    rsa_interpolated = discrete_to_continuous(values=values, value_times=value_times, sampling_rate=sampling_rate)
-
 
-    # Continuous RSA - Steps
-    current_rsa = np.nan
-
-    continuous_rsa = []
-    phase_counter = 0
-    for i in xrange(len(rsp)):
-        if i == rsp_onsets[phase_counter]:
-            current_rsa = rsa[u"RSA_P2T_Values"][phase_counter]
-            if phase_counter < len(rsp_onsets)-2:
-                phase_counter += 1
-        continuous_rsa.append(current_rsa)
-
-    # Find last phase
-    continuous_rsa = np.array(continuous_rsa)
-    continuous_rsa[max(rsp_onsets):] = np.nan
-
-    df = pd.DataFrame({u"RSP":rsp})
-    df[u"RSA_Values"] = continuous_rsa
-    df[u"RSA"] = rsa_interpolated
+    # Continuous RSA: steps (the value of each cycle from its onset to the next) and interpolation using a 3rd order spline
+    df = SparseSignals(sampling_rate)
+    df.add_signal(u"RSP", rsp)
+    df.add_intervals(u"RSA_Values", rsp_onsets[:-1], rsp_onsets[1:], len(rsp), values=np.array(rsa[u"RSA_P2T_Values"], dtype=float), fill=np.nan)
+    df.add_series(u"RSA", value_times, values, len(rsp))
+    if dense is True:
+        df = df.to_dataframe()
     rsa[u"df"] = df
 
     # Porges–Bohrer method (RSAP–B)
@@ -297,16 +300,53 @@ def ecg_rsa(rpeaks, rsp, sampling_rate=1000):
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
+def _ecg_quality_templates(cardiac_cycles, sampling_rate):
+    u"""
+    Turn heartbeats (a Heartbeats object or samples x heartbeats) into the standardized (heartbeats x 192) templates expected by the quality model.
+    """
+    if isinstance(cardiac_cycles, Heartbeats):
+        signal = cardiac_cycles.signal
+        onsets = cardiac_cycles.onsets
+        n_samples = cardiac_cycles.window
+    else:  # Heartbeats laid end to end
+        cardiac_cycles = np.asarray(cardiac_cycles, dtype=float).T
+        n_samples = cardiac_cycles.shape[1]
+        signal = cardiac_cycles.ravel()
+        onsets = np.arange(len(cardiac_cycles))*n_samples
+
+    # Trailing moving average over 20 ms (only read from sample width-1 of each heartbeat, so it never overlaps the previous one)
+    width = min(n_samples, max(1, int(round(0.02*sampling_rate))))
+    cumulative = np.concatenate([[0], np.cumsum(signal)])
+
+    # Linear interpolation of all heartbeats on the 3 ms grid
+    positions = np.clip(np.arange(8, 200)*3*sampling_rate/1000, width-1, n_samples-1)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower+1, n_samples-1)
+    weights = positions - lower
+    lower = onsets[:, np.newaxis] + lower + 1
+    upper = onsets[:, np.newaxis] + upper + 1
+    templates = (cumulative[lower] - cumulative[lower-width])*(1-weights) + (cumulative[upper] - cumulative[upper-width])*weights
+    templates = templates/width
+
+    # Standardize each heartbeat
+    templates = templates - templates.mean(axis=1)[:, np.newaxis]
+    templates = templates/templates.std(axis=1, ddof=1)[:, np.newaxis]
+    return(templates)
+
+
+
 def ecg_signal_quality(cardiac_cycles, sampling_rate, quality_model=u"default"):
     u"""
     Attempt to find the recording lead and the overall and individual quality of hearbeats signal.
 
     Parameters
     ----------
-    cardiac_cycles : pd.DataFrame
-        DataFrame containing heartbeats. Computed by :function:`neurokit.ecg_process`.
+    cardiac_cycles : Heartbeats or pd.DataFrame
+        Heartbeats, computed by :function:`neurokit.ecg_process`, or DataFrame containing heartbeats (one column per heartbeat).
+    sampling_rate : int
+        Sampling rate (samples/second).
     quality_model : str
-        Path to model used to check signal quality. "default" uses the builtin model.
+        Path to model used to check signal quality. "default" uses the builtin model. Models are loaded once per process (see :function:`neurokit.ecg_load_quality_model`). An already loaded model can also be passed.
 
     Returns
     ----------
@@ -323,6 +363,7 @@ def ecg_signal_quality(cardiac_cycles, sampling_rate, quality_model=u"default"):
     *Details*
 
     - **ECG Signal Quality**: Using the PTB-Diagnostic dataset available from PhysioNet, we extracted all the ECG signals from the healthy participants, that contained 15 recording leads/subject. We extracted all cardiac cycles, for each lead, and downsampled them from 600 to 200 datapoints. Note that we dropped the 8 first values that were NaNs. Then, we fitted a neural network model on 2/3 of the dataset (that contains 134392 cardiac cycles) to predict the lead. Model evaluation was done on the remaining 1/3. The model show good performances in predicting the correct recording lead (accuracy=0.91, precision=0.91). In this function, this model is fitted on each cardiac cycle of the provided ECG signal. It returns the probable recording lead (the most common predicted lead), the signal quality of each cardiac cycle (the probability of belonging to the probable recording lead) and the overall signal quality (the mean of signal quality).
+    - **Templates**: Before classification, all heartbeats are smoothed (20 ms moving average), resampled at once to the 192 points (every 3 ms, from 24 to 597 ms after the beginning of the heartbeat) expected by the model and standardized. Heartbeats that are too short are extended with their last value.
 
     *Authors*
 
@@ -333,27 +374,12 @@ def ecg_signal_quality(cardiac_cycles, sampling_rate, quality_model=u"default"):
     - numpy
     - pandas
     """
-    if len(cardiac_cycles) > 200:
-        cardiac_cycles = cardiac_cycles.rolling(20).mean().resample(u"3L").pad()
-    if len(cardiac_cycles) < 200:
-        cardiac_cycles = cardiac_cycles.resample(u"1L").pad()
-        cardiac_cycles = cardiac_cycles.rolling(20).mean().resample(u"3L").pad()
-
-    if len(cardiac_cycles) < 200:
-        fill_dict = {}
-        for i in cardiac_cycles.columns:
-            fill_dict[i] = [np.nan] * (200-len(cardiac_cycles))
-        cardiac_cycles = pd.concat([pd.DataFrame(fill_dict), cardiac_cycles], ignore_index=True)
-
-    cardiac_cycles = cardiac_cycles.fillna(method=u"bfill")
-    cardiac_cycles = cardiac_cycles.reset_index(drop=True)[8:200]
-    cardiac_cycles = z_score(cardiac_cycles).T
-    cardiac_cycles = np.array(cardiac_cycles)
+    cardiac_cycles = _ecg_quality_templates(cardiac_cycles, sampling_rate)
 
-    if quality_model == u"default":
-        model = sklearn.externals.joblib.load(Path.materials() + u'heartbeat_classification.model')
+    if isinstance(quality_model, basestring):
+        model = ecg_load_quality_model(quality_model)
     else:
-        model = sklearn.externals.joblib.load(quality_model)
+        model = quality_model
 
     # Initialize empty dict
     quality = {}
@@ -380,7 +406,194 @@ def ecg_signal_quality(cardiac_cycles, sampling_rate, quality_model=u"default"):
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"nonlinear"]):
+_quality_models = {}
+
+def ecg_load_quality_model(quality_model=u"default"):
+    u"""
+    Loads a heartbeat classification model used by :function:`neurokit.ecg_signal_quality`. Each model is read from the disk only once per process (and again if its file is modified).
+
+    Parameters
+    ----------
+    quality_model : str
+        Path to the model. "default" uses the builtin model.
+
+    Returns
+    ----------
+    model : sklearn estimator
+        The loaded model.
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import multiprocessing
+    >>>
+    >>> model = nk.ecg_load_quality_model()
+    >>> # Pre-load the model in worker processes
+    >>> pool = multiprocessing.Pool(4, initializer=nk.ecg_load_quality_model)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Cache**: Models are stored in a process-wide registry, keyed by their absolute path and modification time. The default and the custom models share the same registry. Worker processes have their own registry, that can be filled when they start (e.g., using this function as the initializer of a multiprocessing pool).
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - sklearn
+    """
+    if quality_model == u"default":
+        quality_model = Path.materials() + u'heartbeat_classification.model'
+    path = os.path.abspath(quality_model)
+    key = (path, os.path.getmtime(path))
+
+    if key not in _quality_models:
+        # Forget the previous versions of the file
+        for outdated in [cached for cached in _quality_models if cached[0] == path]:
+            del _quality_models[outdated]
+        _quality_models[key] = sklearn.externals.joblib.load(path)
+    return(_quality_models[key])
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def ecg_rr_artifacts(RRis, strategies=[u"previous", u"bounds"], tolerance=0.25, bounds=[0.6, 1.3], window=5):
+    u"""
+    Detects artifacts among RR intervals.
+
+    Parameters
+    ----------
+    RRis : list or ndarray
+        RR intervals (in seconds).
+    strategies : list
+        Any or all of "previous" (intervals differing more than `tolerance` from the previous one), "median" (intervals differing more than `tolerance` from the median of the `window` surrounding intervals) or "bounds" (intervals outside of physiological `bounds`).
+    tolerance : float
+        Accepted relative deviation for the "previous" and "median" strategies.
+    bounds : list
+        Minimum and maximum physiological RR intervals (in seconds) for the "bounds" strategy.
+    window : int
+        Number of intervals (odd) over which the median is computed for the "median" strategy.
+
+    Returns
+    ----------
+    artifacts : ndarray
+        Boolean mask, True for the RR intervals detected as artifacts.
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> RRis = np.diff(rpeaks)/1000
+    >>> artifacts = nk.ecg_rr_artifacts(RRis, strategies=["median", "bounds"])
+    >>> clean_RRis = RRis[~artifacts]
+
+    Notes
+    ----------
+    *Details*
+
+    - **previous**: Reproduces the former sequential detection of `ecg_hrv()`, in which an interval following an artifact is compared with the (removed) artifact and therefore always kept. Within a run of intervals that each differ from the previous one, every other interval is thus an artifact. The first interval is compared with the last one.
+    - **median**: Compares each interval with the median of its neighbourhood (reflected at the edges of the series), which is not biased by the artifacts themselves.
+    - **bounds**: Physiological bounds (http://emedicine.medscape.com/article/2172196-overview).
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+
+    References
+    -----------
+    - Lippman, N. E. A. L., Stein, K. M., & Lerman, B. B. (1994). Comparison of methods for removal of ectopy in measurement of heart rate variability. American Journal of Physiology-Heart and Circulatory Physiology, 267(1), H411-H418.
+    """
+    RRis = np.asarray(RRis, dtype=float)
+    artifacts = np.zeros(len(RRis), dtype=bool)
+    if len(RRis) == 0:
+        return(artifacts)
+
+    for strategy in strategies:
+        if strategy not in [u"previous", u"median", u"bounds"]:
+            raise ValueError(u"NeuroKit error: ecg_rr_artifacts(): unknown strategy '" + strategy + u"'.")
+
+    if u"previous" in strategies:
+        previous = np.roll(RRis, 1)
+        deviant = (RRis < previous*(1-tolerance)) | (RRis > previous*(1+tolerance))
+        # An artifact is never followed by another one: in each run of deviant intervals, every other one is an artifact
+        run_starts = np.maximum.accumulate(np.where(deviant, 0, np.arange(1, len(RRis)+1)))
+        artifacts |= deviant & ((np.arange(len(RRis)) - run_starts) % 2 == 0)
+
+    if u"median" in strategies:
+        half = min(window // 2, len(RRis)-1)
+        padded = np.pad(RRis, half, mode=u"reflect")
+        neighbourhoods = np.lib.stride_tricks.as_strided(padded, shape=(len(RRis), 2*half+1), strides=(padded.strides[0], padded.strides[0]), writeable=False)
+        medians = np.median(neighbourhoods, axis=1)
+        artifacts |= np.abs(RRis - medians) > medians*tolerance
+
+    if u"bounds" in strategies:
+        artifacts |= (RRis < bounds[0]) | (RRis > bounds[1])
+
+    return(artifacts)
+
+
+
+
+# Tiers of nonlinear HRV indices and their cost, from the cheapest to the most expensive: (index, tier, outputs)
+_hrv_tiers = [u"fast", u"standard", u"full"]
+_hrv_nonlinear_costs = [(u"Shannon", u"fast", [u"Shannon"]),  # O(n)
+                        (u"FD_Petrosian", u"fast", [u"FD_Petrosian"]),  # O(n)
+                        (u"Entropy_SVD", u"fast", [u"Entropy_SVD"]),  # O(n)
+                        (u"Fisher_Info", u"fast", [u"Fisher_Info"]),  # O(n)
+                        (u"Entropy_Spectral", u"fast", [u"Entropy_Spectral_VLF", u"Entropy_Spectral_LF", u"Entropy_Spectral_HF"]),  # O(n log(n))
+                        (u"FD_Higushi", u"fast", [u"FD_Higushi"]),  # O(n k_max)
+                        (u"DFA", u"fast", [u"DFA_1", u"DFA_2"]),  # O(n) per window size
+                        (u"Sample_Entropy", u"standard", [u"Sample_Entropy"]),  # O(n log(n)) (KD-tree)
+                        (u"Entropy_Multiscale_AUC", u"standard", [u"Entropy_Multiscale_AUC"]),  # O(n log(n)) per scale
+                        (u"Correlation_Dimension", u"full", [u"Correlation_Dimension"]),  # O(n^2)
+                        (u"Lyapunov", u"full", [u"Lyapunov"])]  # O(n^2 emb_dim)
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def _ecg_hrv_geometric(RR, n_intervals, bin_width=8):
+    u"""
+    Triangular index and Shannon entropy of the histogram of RR intervals (in ms), for a number of bins (between 2 and 49) giving a class width closest to `bin_width` (Voss, 2015).
+    """
+    RR = np.asarray(RR, dtype=float)
+    try:
+        # The class width is the range divided by the number of bins: the best number of bins surrounds range/bin_width
+        data_range = np.max(RR) - np.min(RR)
+        candidates = np.clip([np.floor(data_range/bin_width), np.ceil(data_range/bin_width)], 2, 49).astype(int)
+        bin_number = candidates[np.argmin(np.abs(bin_width - data_range/candidates))]
+
+        density = np.histogram(RR, bins=bin_number, density=True)[0]
+        geometric = {u"Triang": n_intervals/np.max(density),
+                     u"Shannon_h": complexity_entropy_shannon(density)}
+    except ValueError:
+        geometric = {u"Triang": np.nan,
+                     u"Shannon_h": np.nan}
+    return(geometric)
+
+
+
+def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"nonlinear"], backend=u"neurokit", artifacts=[u"previous", u"bounds"], resample_rate=4, dense=False, psd_method=u"multitaper", time_budget=None):
     u"""
     Computes the Heart-Rate Variability (HRV). Shamelessly stolen from the `hrv <https://github.com/rhenanbartels/hrv/blob/develop/hrv>`_ package by Rhenan Bartels. All credits go to him.
 
@@ -390,8 +603,20 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
         R-peak location indices.
     sampling_rate : int
         Sampling rate (samples/second).
-    hrv_features : list
-        What HRV indices to compute. Any or all of 'time', 'frequency' or 'nonlinear'.
+    hrv_features : list or str
+        What HRV indices to compute. Any or all of 'time', 'frequency' or 'nonlinear'. Can also be a tier ("fast", "standard" or "full"): all time and frequency domain indices, and the nonlinear indices up to that tier (see the cost model below). ['time', 'frequency', 'nonlinear'] is equivalent to "full".
+    backend : str
+        Used for nonlinear indices. "neurokit" (default) uses the in-package estimators when available (e.g., the KD-tree based sample entropy). "nolds" delegates them to nolds.
+    artifacts : list
+        Artifact detection strategies, passed to :function:`neurokit.ecg_rr_artifacts`. The default reproduces the detection of previous versions.
+    resample_rate : int
+        Sampling rate (samples/second) of the interpolated RR intervals (tachogram) used by the frequency domain indices. None uses `sampling_rate`.
+    dense : bool or str
+        If True, returns in "df" the interpolated RR intervals and the amplitude of each frequency band at `sampling_rate` (one value per sample of the ECG). If "sparse", returns them as a :class:`neurokit.SparseSignals` object, storing the RR intervals and the amplitudes at `resample_rate`, materialized at `sampling_rate` on request.
+    psd_method : str
+        Power spectral density used for the frequency domain indices. "multitaper" (default) on the interpolated RR intervals, or "lombscargle" directly on the RR intervals and their (unevenly spaced) beat times.
+    time_budget : float
+        Maximum duration (in seconds) of the call. Once it is exceeded, the remaining nonlinear indices (computed from the cheapest to the most expensive) are skipped and set to NaN. Their names are then listed in "Status". None (default) computes all the requested indices.
 
     Returns
     ----------
@@ -419,7 +644,7 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
        - **mcvNN**: Median-based Coefficient of Variation, *i.e.* the ratio of madNN divided by medianNN.
        - **pNN50**: The proportion derived by dividing NN50 (The number of interval differences of successive RR intervals greater than 50 ms) by the total number of RR intervals.
        - **pNN20**: The proportion derived by dividing NN20 (The number of interval differences of successive RR intervals greater than 20 ms) by the total number of RR intervals.
-       - **Triang**: The HRV triangular index measurement is the integral of the density distribution (that is, the number of all RR intervals) divided by the maximum of the density distribution (class width of 8ms).
+       - **Triang**: The HRV triangular index measurement is the integral of the density distribution (that is, the number of all RR intervals) divided by the maximum of the density distribution (class width of 8ms). Computed on the RR intervals themselves (after artifact removal).
        - **Shannon_h**: Shannon Entropy calculated on the basis of the class probabilities pi (i = 1,...,n with n—number of classes) of the NN interval density distribution (class width of 8 ms resulting in a smoothed histogram suitable for HRV analysis).
        - **VLF** is the variance (*i.e.*, power) in HRV in the Very Low Frequency (.003 to .04 Hz). Reflect an intrinsic rhythm produced by the heart which is modulated by primarily by sympathetic activity.
        - **LF**  is the variance (*i.e.*, power) in HRV in the Low Frequency (.04 to .15 Hz). Reflects a mixture of sympathetic and parasympathetic activity, but in long-term recordings like ours, it reflects sympathetic activity and can be reduced by the beta-adrenergic antagonist propanolol (McCraty & Atkinson, 1996).
@@ -434,7 +659,7 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
        - **Shannon**: Shannon Entropy over the RR intervals array.
        - **Sample_Entropy**: Sample Entropy (SampEn) over the RR intervals array with emb_dim=2.
        - **Correlation_Dimension**: Correlation Dimension over the RR intervals array with emb_dim=2.
-       - **Entropy_Multiscale**: Multiscale Entropy over the RR intervals array  with emb_dim=2.
+       - **Entropy_Multiscale_AUC**: Complexity index (area under the curve) of the Multiscale Entropy over the RR intervals array with emb_dim=2.
        - **Entropy_SVD**: SVD Entropy over the RR intervals array with emb_dim=2.
        - **Entropy_Spectral_VLF**: Spectral Entropy over the RR intervals array in the very low frequency (0.003-0.04).
        - **Entropy_Spectral_LF**: Spectral Entropy over the RR intervals array in the low frequency (0.4-0.15).
@@ -443,6 +668,13 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
        - **Lyapunov**: Lyapunov Exponent over the RR intervals array with emb_dim=58 and matrix_dim=4.
        - **FD_Petrosian**: Petrosian's Fractal Dimension over the RR intervals.
        - **FD_Higushi**: Higushi's Fractal Dimension over the RR intervals array with k_max=16.
+    - **Lomb-Scargle**: With `psd_method="lombscargle"`, the spectrum is evaluated on a fixed grid (0.0005 to 0.5 Hz, by steps of 0.0005 Hz) directly from the beat times, without interpolation nor MNE (see :function:`neurokit.psd_lombscargle`). It is scaled like the multitaper spectrum, so that the indices of both methods are comparable.
+    - **Cost model**: The nonlinear indices are computed from the cheapest to the most expensive, and grouped in tiers. Indicative durations are given for a one hour recording (about 4000 RR intervals).
+
+       - **fast**: Shannon, FD_Petrosian, Entropy_SVD, Fisher_Info, Entropy_Spectral_* and FD_Higushi (linear or n·log(n) cost, about 1 ms each), DFA_1 and DFA_2 (one pass per window size, about 30 ms).
+       - **standard**: Sample_Entropy and Entropy_Multiscale_AUC (KD-tree neighbour search, about n·log(n), 50 to 100 ms).
+       - **full**: Correlation_Dimension and Lyapunov (quadratic cost, a few seconds each). They can represent most of the duration of `ecg_process()`.
+    - **Tachogram**: The frequency domain indices are computed on the RR intervals interpolated (3rd order spline) at `resample_rate` (4 Hz by default), well above the highest frequency band (0.5 Hz), rather than at the sampling rate of the ECG. For a one hour recording at 1000 Hz, this is 14400 instead of 3600000 points. Continuous signals ("df") are upsampled back to the ECG sampling rate only if `dense` is True.
 
     *Authors*
 
@@ -469,6 +701,16 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
     """
     # Initialize empty dict
     hrv = {}
+    start = builtin_time.time()
+
+    # Tiers
+    if isinstance(hrv_features, basestring):
+        if hrv_features not in _hrv_tiers:
+            raise ValueError(u"NeuroKit error: ecg_hrv(): unknown tier '" + hrv_features + u"'. Should be 'fast', 'standard' or 'full'.")
+        tier = hrv_features
+        hrv_features = [u"time", u"frequency", u"nonlinear"]
+    else:
+        tier = u"full"
 
     # Preprocessing
     # ==================
@@ -481,28 +723,18 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
     RRis = RRis.astype(float)
 
 
-    # Artifact detection - Statistical
-    for index, rr in enumerate(RRis):
-        # Remove RR intervals that differ more than 25% from the previous one
-        if RRis[index] < RRis[index-1]*0.75:
-            RRis[index] = np.nan
-        if RRis[index] > RRis[index-1]*1.25:
-            RRis[index] = np.nan
-
-    # Artifact detection - Physiological (http://emedicine.medscape.com/article/2172196-overview)
-    RRis = pd.Series(RRis)
-    RRis[RRis < 0.6] = np.nan
-    RRis[RRis > 1.3] = np.nan
-
      # Sanity check
     if len(RRis) <= 1:
         print u"NeuroKit Warning: ecg_hrv(): Not enough R peaks to compute HRV :/"
         return(hrv)
 
+    # Artifact detection
+    artifacts = ecg_rr_artifacts(RRis, strategies=artifacts)
+
     # Artifacts treatment
-    hrv[u"n_Artifacts"] = pd.isnull(RRis).sum()/len(RRis)
-    artifacts_indices = RRis.index[RRis.isnull()]  # get the artifacts indices
-    RRis = RRis.drop(artifacts_indices)  # remove the artifacts
+    hrv[u"n_Artifacts"] = artifacts.mean()
+    artifacts_indices = np.flatnonzero(artifacts)  # get the artifacts indices
+    RRis = pd.Series(RRis[~artifacts], index=np.flatnonzero(~artifacts))  # remove the artifacts
 
 
     # Rescale to 1000Hz
@@ -530,6 +762,12 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
         hrv[u"pNN50"] = nn50 / len(RRis) * 100
         hrv[u"pNN20"] = nn20 / len(RRis) * 100
 
+    # Geometrical Method (actually part of time domain)
+    # =========================================
+    # TODO: This part needs to be checked by an expert. Also, it would be better to have Renyi entropy (a generalization of shannon's), but I don't know how to compute it.
+    if u"time" in hrv_features or u"frequency" in hrv_features:
+        hrv.update(_ecg_hrv_geometric(RRis, len(RRis)))  # On the RR intervals themselves, whatever the interpolation
+
 
 
 
@@ -542,37 +780,20 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
         # Interpolation
         # =================
         # Convert to continuous RR interval (RRi)
-        beats_times = rpeaks[1:]  # the time at which each beat occured starting from the 2nd beat
-        beats_times -= beats_times[0]
+        beats_times = np.array(rpeaks[1:]) - rpeaks[1]  # the time at which each beat occured starting from the 2nd beat
         beats_times = np.delete(beats_times, artifacts_indices)  # delete also the artifact beat moments
 
+        # All the frequency bands of interest are below 0.5 Hz: interpolate at resample_rate rather than at sampling_rate
+        if resample_rate is None:
+            resample_rate = sampling_rate
         try:
-            RRi = discrete_to_continuous(RRis, beats_times, sampling_rate)  # Interpolation using 3rd order spline
+            RRi = discrete_to_continuous(RRis, beats_times*resample_rate/sampling_rate if resample_rate != sampling_rate else beats_times, resample_rate)  # Interpolation using 3rd order spline
         except TypeError:
             print u"NeuroKit Warning: ecg_hrv(): Sequence too short to compute interpolation. Will skip many features."
             return(hrv)
 
         # Rescale to 1000Hz
         RRi = RRi*1000
-        hrv[u"df"] = RRi.to_frame(u"ECG_RR_Interval")  # Continuous (interpolated) signal of RRi
-
-
-
-        # Geometrical Method (actually part of time domain)
-        # =========================================
-        # TODO: This part needs to be checked by an expert. Also, it would be better to have Renyi entropy (a generalization of shannon's), but I don't know how to compute it.
-        try:
-            bin_number = 32  # Initialize bin_width value
-            # find the appropriate number of bins so the class width is approximately 8 ms (Voss, 2015)
-            for bin_number_current in xrange(2, 50):
-                bin_width = np.diff(np.histogram(RRi, bins=bin_number_current, density=True)[1])[0]
-                if abs(8 - bin_width) < abs(8 - np.diff(np.histogram(RRi, bins=bin_number, density=True)[1])[0]):
-                    bin_number = bin_number_current
-            hrv[u"Triang"] = len(RRis)/np.max(np.histogram(RRi, bins=bin_number, density=True)[0])
-            hrv[u"Shannon_h"] = complexity_entropy_shannon(np.histogram(RRi, bins=bin_number, density=True)[0])
-        except ValueError:
-            hrv[u"Triang"] = np.nan
-            hrv[u"Shannon_h"] = np.nan
 
 
 
@@ -587,24 +808,37 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
 
 
 
-        # Frequency-Domain Power over time
-        freq_powers = {}
-        for band in freq_bands:
-            freqs = freq_bands[band]
-            # Filter to keep only the band of interest
-            filtered, sampling_rate, params = biosppy.signals.tools.filter_signal(signal=RRi, ftype=u'butter', band=u'bandpass', order=1, frequency=freqs, sampling_rate=sampling_rate)
-            # Apply Hilbert transform
-            amplitude, phase = biosppy.signals.tools.analytic_signal(filtered)
-            # Extract Amplitude of Envolope (power)
-            freq_powers[u"ECG_HRV_" + band] = amplitude
-
-        freq_powers = pd.DataFrame.from_dict(freq_powers)
-        freq_powers.index = hrv[u"df"].index
-        hrv[u"df"] = pd.concat([hrv[u"df"], freq_powers], axis=1)
-
-
-        # Compute Power Spectral Density (PSD) using multitaper method
-        power, freq = mne.time_frequency.psd_array_multitaper(RRi, sfreq=sampling_rate, fmin=0, fmax=0.5,  adaptive=False, normalization=u'length')
+        # Continuous signals, upsampled back to sampling_rate
+        if dense is True:
+            if resample_rate == sampling_rate:
+                hrv[u"df"] = RRi.to_frame(u"ECG_RR_Interval")
+            else:
+                hrv[u"df"] = (discrete_to_continuous(RRis, beats_times, sampling_rate)*1000).to_frame(u"ECG_RR_Interval")
+
+            # Frequency-Domain Power over time (amplitude of the envelope of each band, from a single FFT)
+            freq_powers = band_envelopes(RRi, resample_rate, freq_bands, order=1)
+            resampled_times = np.arange(len(RRi))/resample_rate
+            dense_times = np.arange(len(hrv[u"df"]))/sampling_rate
+            for band in sorted(freq_powers):
+                hrv[u"df"][u"ECG_HRV_" + band] = np.interp(dense_times, resampled_times, freq_powers[band])
+        elif dense == u"sparse":
+            hrv[u"df"] = SparseSignals(sampling_rate)
+            hrv[u"df"].add_series(u"ECG_RR_Interval", beats_times, RRis*1000)
+            freq_powers = band_envelopes(RRi, resample_rate, freq_bands, order=1)
+            for band in sorted(freq_powers):
+                hrv[u"df"].add_resampled(u"ECG_HRV_" + band, freq_powers[band], resample_rate, start=beats_times[0], length=beats_times[-1]-beats_times[0])
+
+
+        if psd_method == u"lombscargle":
+            # Compute Power Spectral Density (PSD) on the beat times using Lomb-Scargle method
+            freq = np.arange(1, 1001)*0.0005
+            power = psd_lombscargle(beats_times/sampling_rate, RRis*1000, freq)
+            power = power*sampling_rate  # Same scale as the multitaper PSD
+        else:
+            # Compute Power Spectral Density (PSD) using multitaper method
+            import mne  # Heavy, only needed here
+            power, freq = mne.time_frequency.psd_array_multitaper(RRi, sfreq=resample_rate, fmin=0, fmax=0.5,  adaptive=False, normalization=u'length')
+            power = power*sampling_rate/resample_rate  # This normalization scales with sfreq: keep the powers of the tachogram at sampling_rate
 
 
 
@@ -627,29 +861,64 @@ def ecg_hrv(rpeaks, sampling_rate=1000, hrv_features=[u"time", u"frequency", u"n
     # Non-Linear Dynamics
     # ======================
     if u"nonlinear" in hrv_features:
+        ranges = {}
         if len(RRis) > 17:
-            hrv[u"DFA_1"] = nolds.dfa(RRis, xrange(4, 17))
+            ranges[u"DFA_1"] = xrange(4, 17)
         if len(RRis) > 66:
-            hrv[u"DFA_2"] = nolds.dfa(RRis, xrange(16, 66))
-        hrv[u"Shannon"] = complexity_entropy_shannon(RRis)
-        hrv[u"Sample_Entropy"] = nolds.sampen(RRis, emb_dim=2)
-        try:
-            hrv[u"Correlation_Dimension"] = nolds.corr_dim(RRis, emb_dim=2)
-        except AssertionError, error:
-            print u"NeuroKit Warning: ecg_hrv(): Correlation Dimension. Error: " + unicode(error)
-            hrv[u"Correlation_Dimension"] = np.nan
-        hrv[u"Entropy_Multiscale"] = complexity_entropy_multiscale(RRis, emb_dim=2)
-        hrv[u"Entropy_SVD"] = complexity_entropy_svd(RRis, emb_dim=2)
-        hrv[u"Entropy_Spectral_VLF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.0033, 0.04, 0.001))
-        hrv[u"Entropy_Spectral_LF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.04, 0.15, 0.001))
-        hrv[u"Entropy_Spectral_HF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.15, 0.40, 0.001))
-        hrv[u"Fisher_Info"] = complexity_fisher_info(RRis, tau=1, emb_dim=2)
-        try:  # Otherwise travis errors for some reasons :(
-            hrv[u"Lyapunov"] = np.max(nolds.lyap_e(RRis.values, emb_dim=58, matrix_dim=4))
-        except Exception:
-            hrv[u"Lyapunov"] = np.nan
-        hrv[u"FD_Petrosian"] = complexity_fd_petrosian(RRis)
-        hrv[u"FD_Higushi"] = complexity_fd_higushi(RRis, k_max=16)
+            ranges[u"DFA_2"] = xrange(16, 66)
+
+        status = {}
+        for feature, feature_tier, outputs in _hrv_nonlinear_costs:
+            if _hrv_tiers.index(feature_tier) > _hrv_tiers.index(tier):
+                continue
+            if feature == u"DFA":
+                outputs = sorted(ranges)
+
+            # Skip the remaining indices once the time budget is exhausted
+            if time_budget is not None and builtin_time.time() - start > time_budget:
+                status[feature] = u"skipped"
+                for output in outputs:
+                    hrv[output] = np.nan
+                continue
+
+            if feature == u"Shannon":
+                hrv[u"Shannon"] = complexity_entropy_shannon(RRis)
+            elif feature == u"FD_Petrosian":
+                hrv[u"FD_Petrosian"] = complexity_fd_petrosian(RRis)
+            elif feature == u"Entropy_SVD":
+                hrv[u"Entropy_SVD"] = complexity_entropy_svd(RRis, emb_dim=2)
+            elif feature == u"Fisher_Info":
+                hrv[u"Fisher_Info"] = complexity_fisher_info(RRis, tau=1, emb_dim=2)
+            elif feature == u"Entropy_Spectral":
+                hrv[u"Entropy_Spectral_VLF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.0033, 0.04, 0.001))
+                hrv[u"Entropy_Spectral_LF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.04, 0.15, 0.001))
+                hrv[u"Entropy_Spectral_HF"] = complexity_entropy_spectral(RRis, sampling_rate, bands=np.arange(0.15, 0.40, 0.001))
+            elif feature == u"FD_Higushi":
+                hrv[u"FD_Higushi"] = complexity_fd_higushi(RRis, k_max=16)
+            elif feature == u"DFA":
+                if backend == u"nolds":
+                    for name, nvals in ranges.items():
+                        hrv[name] = nolds.dfa(RRis, nvals)
+                elif len(ranges) > 0:
+                    hrv.update(complexity_dfa(RRis, ranges=ranges))
+            elif feature == u"Sample_Entropy":
+                hrv[u"Sample_Entropy"] = complexity_entropy_sample(RRis, emb_dim=2, backend=backend)
+            elif feature == u"Entropy_Multiscale_AUC":
+                hrv[u"Entropy_Multiscale_AUC"] = complexity_entropy_multiscale(RRis, emb_dim=2)[u"MSE_AUC"]
+            elif feature == u"Correlation_Dimension":
+                try:
+                    hrv[u"Correlation_Dimension"] = nolds.corr_dim(RRis, emb_dim=2)
+                except AssertionError, error:
+                    print u"NeuroKit Warning: ecg_hrv(): Correlation Dimension. Error: " + unicode(error)
+                    hrv[u"Correlation_Dimension"] = np.nan
+            elif feature == u"Lyapunov":
+                try:  # Otherwise travis errors for some reasons :(
+                    hrv[u"Lyapunov"] = np.max(nolds.lyap_e(RRis.values, emb_dim=58, matrix_dim=4))
+                except Exception:
+                    hrv[u"Lyapunov"] = np.nan
+
+        if time_budget is not None:
+            hrv[u"Status"] = status
 
     # TO DO:
     # Include many others (see Voss 2015)
@@ -23,7 +23,7 @@ from ..statistics import *
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"bandpass", filter_frequency=[3, 45], filter_order=0.3, segmenter=u"hamilton"):
+def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"bandpass", filter_frequency=[3, 45], filter_order=0.3, segmenter=u"hamilton", output=u"dense"):
     u"""
     ECG signal preprocessing.
 
@@ -43,11 +43,13 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
         Filter order.
     segmenter : str
         The cardiac phase segmenter. Can be "hamilton", "gamboa", "engzee", "christov", "ssf" or "pekkanen".
+    output : str
+        "dense" (default) returns the signals ("df") as a DataFrame. "sparse" returns them as a :class:`neurokit.SparseSignals` object, storing the R-peaks, the systoles and the heart rate as compact arrays, and materializing their columns on request.
 
     Returns
     ----------
     ecg_preprocessed : dict
-        Preprocesed ECG.
+        Preprocesed ECG. The heartbeats ("Cardiac_Cycles") are a :class:`neurokit.Heartbeats` object.
 
     Example
     ----------
@@ -58,6 +60,7 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
     ----------
     *Details*
 
+    - **Filtering**: Zero-phase filtering by :func:`neurokit.filter_zerophase()`, using FFT convolution by blocks for FIR filters (whose order is `filter_order` times the sampling rate, i.e., 300 taps at 1000 Hz) and second-order sections for IIR filters.
     - **segmenter**: Different methods of segmentation are implemented: **hamilton** (`Hamilton, 2002 <http://www.eplimited.com/osea13.pdf/>`_) , **gamboa** (`gamboa, 2008 <http://www.lx.it.pt/~afred/pub/thesisHugoGamboa.pdf/>`_), **engzee** (Engelse and Zeelenberg, 1979; Lourenco et al., 2012), **christov** (Christov, 2004) or **ssf** (Slope Sum Function), **pekkanen**  (`Kathirvel, 2001) <http://link.springer.com/article/10.1007/s13239-011-0065-3/fulltext.html>`_.
 
 
@@ -83,6 +86,9 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
     - Engelse, W. A. H., & Zeelenberg, C. (1979). A single scan algorithm for QRS-detection and feature extraction. Computers in cardiology, 6(1979), 37-42.
     - Lourenço, A., Silva, H., Leite, P., Lourenço, R., & Fred, A. L. (2012, February). Real Time Electrocardiogram Segmentation for Finger based ECG Biometrics. In Biosignals (pp. 49-54).
     """
+    if output not in [u"dense", u"sparse"]:
+        raise ValueError(u"NeuroKit error: ecg_preprocess(): output should be 'dense' or 'sparse'.")
+
     # Signal Processing
     # =======================
     # Transform to array
@@ -93,12 +99,12 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
     # Filter signal
     if filter_type in [u"FIR", u"butter", u"cheby1", u"cheby2", u"ellip", u"bessel"]:
         order = int(filter_order * sampling_rate)
-        filtered, _, _ = biosppy.tools.filter_signal(signal=ecg,
-                                          ftype=filter_type,
-                                          band=filter_band,
-                                          order=order,
-                                          frequency=filter_frequency,
-                                          sampling_rate=sampling_rate)
+        filtered = filter_zerophase(ecg,
+                                    sampling_rate=sampling_rate,
+                                    ftype=filter_type,
+                                    band=filter_band,
+                                    order=order,
+                                    frequency=filter_frequency)
     else:
         filtered = ecg  # filtered is not-filtered
 
@@ -125,12 +131,9 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
                              sampling_rate=sampling_rate,
                              tol=0.05)
 
-    # Extract cardiac cycles and rpeaks
-    cardiac_cycles, rpeaks = biosppy.ecg.extract_heartbeats(signal=filtered,
-                                           rpeaks=rpeaks,
-                                           sampling_rate=sampling_rate,
-                                           before=0.2,
-                                           after=0.4)
+    # Extract cardiac cycles (views over the filtered signal) and rpeaks
+    heartbeats = Heartbeats(filtered, rpeaks, sampling_rate, before=0.2, after=0.4)
+    rpeaks = heartbeats.rpeaks
 
     # Compute heart rate
     heart_rate_idx, heart_rate = biosppy.tools.get_heart_rate(beats=rpeaks,
@@ -145,53 +148,401 @@ def ecg_preprocess(ecg, sampling_rate=1000, filter_type=u"FIR", filter_band=u"ba
     heart_rate_times = ts[heart_rate_idx]
     heart_rate_times = np.round(heart_rate_times*sampling_rate).astype(int)  # Convert heart rate times to timepoints
 
-    # what for is this line in biosppy??
-#    cardiac_cycles_tmpl = np.linspace(-0.2, 0.4, cardiac_cycles.shape[1], endpoint=False)
-
-    # Prepare Output Dataframe
+    # Prepare Output Signals (compact arrays, columns materialized on request)
     # ==========================
-    ecg_df = pd.DataFrame({u"ECG_Raw": np.array(ecg)})  # Create a dataframe
-    ecg_df[u"ECG_Filtered"] = filtered  # Add filtered signal
+    ecg_df = SparseSignals(sampling_rate)
+    ecg_df.add_signal(u"ECG_Raw", ecg)
+    ecg_df.add_signal(u"ECG_Filtered", filtered)
 
     # Add R peaks
-    rpeaks_signal = np.array([np.nan]*len(ecg))
-    rpeaks_signal[rpeaks] = 1
-    ecg_df[u"ECG_R_Peaks"] = rpeaks_signal
+    ecg_df.add_events(u"ECG_R_Peaks", rpeaks, length)
 
-
-    # Heart Rate
-    try:
-        heart_rate = discrete_to_continuous(heart_rate, heart_rate_times, sampling_rate)  # Interpolation using 3rd order spline
-        ecg_df[u"Heart_Rate"] = heart_rate
-    except TypeError:
+    # Heart Rate (interpolation using 3rd order spline)
+    if len(heart_rate) <= 3:
         print u"NeuroKit Warning: ecg_process(): Sequence too short to compute heart rate."
-        ecg_df[u"Heart_Rate"] = np.nan
+    ecg_df.add_series(u"Heart_Rate", heart_rate_times, heart_rate, length)
 
     # Store Additional Feature
     # ========================
-    processed_ecg = {u"df": ecg_df,
-                     u"ECG": {
+    processed_ecg = {u"ECG": {
                             u"R_Peaks": rpeaks
                             }
                      }
 
     # Heartbeats
-    heartbeats = pd.DataFrame(cardiac_cycles).T
-    heartbeats.index = pd.date_range(pd.datetime.today(), periods=len(heartbeats), freq=unicode(int(1000/sampling_rate)) + u"L")
     processed_ecg[u"ECG"][u"Cardiac_Cycles"] = heartbeats
 
     # Waves
-    waves = ecg_wave_detector(ecg_df[u"ECG_Filtered"], rpeaks)
+    waves = ecg_wave_detector(filtered, rpeaks)
     processed_ecg[u"ECG"].update(waves)
 
     # Systole
-    processed_ecg[u"df"][u"ECG_Systole"] = ecg_systole(ecg_df[u"ECG_Filtered"], rpeaks, waves[u"T_Waves"])
+    systoles = ecg_systole(filtered, rpeaks, waves[u"T_Waves"], output=u"intervals")
+    ecg_df.add_intervals(u"ECG_Systole", systoles[u"Systole_Onsets"], systoles[u"Systole_Offsets"], length)
 
+    if output == u"dense":
+        ecg_df = ecg_df.to_dataframe()
+    processed_ecg[u"df"] = ecg_df
 
     return(processed_ecg)
 
 
 
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+class Heartbeats(object):
+    u"""
+    Heartbeats (cardiac cycles) of an ECG signal, stored as the signal and the R-peaks rather than as a copy of every heartbeat window.
+
+    Its methods (functions) are:
+        - to_array()
+        - to_dataframe()
+    See those for further informations.
+
+    Parameters
+    ----------
+    signal : list or ndarray
+        (Filtered) ECG signal.
+    rpeaks : list or ndarray
+        R-peak location indices.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    before : float
+        Duration (in seconds) of the heartbeat window before the R-peak.
+    after : float
+        Duration (in seconds) of the heartbeat window after the R-peak.
+
+    Returns
+    ----------
+    None
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>>
+    >>> ecg = nk.ecg_preprocess(signal, sampling_rate=1000)
+    >>> heartbeats = ecg["ECG"]["Cardiac_Cycles"]
+    >>> first_beat = heartbeats[0]
+    >>> heartbeats.to_dataframe().plot(legend=False)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Memory**: `windows` is a read-only strided view of all the (samples x window) windows of the signal, sharing its memory. The heartbeat *i* is the window starting at `onsets[i]` (its R-peak minus `before`). Indexing or iterating returns views; a (heartbeats x window) copy is made only by `to_array()` (or `np.array()`) and `to_dataframe()`.
+    - **R-peaks**: As in biosppy's `extract_heartbeats()`, R-peaks too close to the edges of the signal for a complete window are dropped. `rpeaks` contains the remaining ones.
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+    - pandas
+    """
+    def __init__(self, signal, rpeaks, sampling_rate=1000, before=0.2, after=0.4):
+        signal = np.asarray(signal, dtype=float)
+        self.sampling_rate = sampling_rate
+        self.before = int(before*sampling_rate)
+        self.window = self.before + int(after*sampling_rate)
+
+        rpeaks = np.sort(np.asarray(rpeaks, dtype=int))
+        self.rpeaks = rpeaks[(rpeaks >= self.before) & (rpeaks - self.before + self.window <= len(signal))]
+        self.onsets = self.rpeaks - self.before
+
+        self.windows = np.lib.stride_tricks.as_strided(signal, shape=(max(0, len(signal)-self.window+1), self.window), strides=(signal.strides[0], signal.strides[0]), writeable=False)
+        self.signal = np.lib.stride_tricks.as_strided(signal, writeable=False)
+
+    def __len__(self):
+        return(len(self.onsets))
+
+    def __getitem__(self, index):
+        return(self.windows[self.onsets[index]])
+
+    def __iter__(self):
+        for onset in self.onsets:
+            yield self.windows[onset]
+
+    def __array__(self, dtype=None):
+        return(self.to_array().astype(dtype) if dtype is not None else self.to_array())
+
+    def to_array(self):
+        u"""
+        Copies the heartbeats in a (heartbeats x window) array.
+
+        Returns
+        ----------
+        heartbeats : ndarray
+            One row per heartbeat.
+        """
+        return(self.windows[self.onsets])
+
+    def to_dataframe(self):
+        u"""
+        Copies the heartbeats in a DataFrame, with one column per heartbeat, indexed by the time (in seconds) relative to the R-peak.
+
+        Returns
+        ----------
+        heartbeats : pd.DataFrame
+            One column per heartbeat.
+        """
+        heartbeats = pd.DataFrame(self.to_array().T)
+        heartbeats.index = (np.arange(self.window) - self.before) / self.sampling_rate
+        return(heartbeats)
+
+
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+class SparseSignals(object):
+    u"""
+    Signals of a recording stored as compact arrays (the signals themselves, event indices, intervals and low-rate series) rather than as full-length columns, which are materialized on request.
+
+    Its methods (functions) are:
+        - add_signal()
+        - add_events()
+        - add_intervals()
+        - add_series()
+        - add_resampled()
+        - update()
+        - to_dataframe()
+    See those for further informations.
+
+    Parameters
+    ----------
+    sampling_rate : int
+        Sampling rate (samples/second) of the materialized columns.
+
+    Returns
+    ----------
+    None
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>>
+    >>> ecg = nk.ecg_preprocess(signal, sampling_rate=1000, output="sparse")
+    >>> signals = ecg["df"]
+    >>> heart_rate = signals["Heart_Rate"]
+    >>> signals.to_dataframe([u"ECG_Filtered", u"ECG_R_Peaks"]).plot()
+
+    Notes
+    ----------
+    *Details*
+
+    - **Memory**: A column is only built, as a pd.Series indexed by samples, when accessed (`signals["column"]`) or by `to_dataframe()`, and is not kept. For a 24 hours recording at 1000 Hz, each column is about 700 MB in float64, while the R-peaks are about 100000 integers. The columns match those of the dense output (NaN where a column is not defined).
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+    - pandas
+    - scipy
+    """
+    def __init__(self, sampling_rate=1000):
+        self.sampling_rate = sampling_rate
+        self.columns = []
+        self.data = {}
+
+    def _add(self, name, kind, start, end, **arrays):
+        if name not in self.data:
+            self.columns.append(name)
+        arrays.update({u"kind": kind, u"start": int(start), u"end": int(end)})
+        self.data[name] = arrays
+
+    def add_signal(self, name, signal):
+        u"""
+        Adds a signal (one value per sample), stored without copy.
+
+        Parameters
+        ----------
+        name : str
+            Column name.
+        signal : list or ndarray
+            Signal.
+        """
+        signal = np.asarray(signal)
+        self._add(name, u"signal", 0, len(signal), values=signal)
+
+    def add_events(self, name, indices, length):
+        u"""
+        Adds events, materialized as 1 at their indices and NaN elsewhere.
+
+        Parameters
+        ----------
+        name : str
+            Column name.
+        indices : list or ndarray
+            Events indices.
+        length : int
+            Length of the column.
+        """
+        self._add(name, u"events", 0, length, indices=np.asarray(indices, dtype=int))
+
+    def add_intervals(self, name, onsets, offsets, length, values=None, fill=0):
+        u"""
+        Adds intervals, materialized as a value from each onset to its offset (excluded) and `fill` elsewhere.
+
+        Parameters
+        ----------
+        name : str
+            Column name.
+        onsets : list or ndarray
+            Onsets indices (sorted, non overlapping intervals).
+        offsets : list or ndarray
+            Offsets indices (excluded).
+        length : int
+            Length of the column.
+        values : list or ndarray
+            Value of each interval. None (default) materializes an int8 column with 1 within the intervals.
+        fill : float
+            Value outside the intervals.
+        """
+        onsets = np.asarray(onsets, dtype=int)
+        if values is None:
+            values = np.ones(len(onsets), dtype=np.int8)
+        self._add(name, u"intervals", 0, length, onsets=onsets, offsets=np.asarray(offsets, dtype=int), values=np.asarray(values), fill=fill)
+
+    def add_series(self, name, times, values, length=None):
+        u"""
+        Adds a series of values at given samples, materialized by 3rd order spline interpolation (see :func:`neurokit.discrete_to_continuous()`).
+
+        Parameters
+        ----------
+        name : str
+            Column name.
+        times : list or ndarray
+            Samples of the values.
+        values : list or ndarray
+            Values.
+        length : int
+            Length of the column (the interpolation is truncated). None (default) stops at the last value.
+        """
+        times = np.asarray(times, dtype=int)
+        if len(times) == 0:
+            self._add(name, u"series", 0, 0, times=times, values=np.asarray(values))
+        else:
+            self._add(name, u"series", times[0], times[-1] if length is None else min(times[-1], length), times=times, values=np.asarray(values))
+
+    def add_resampled(self, name, values, rate, start=0, length=None):
+        u"""
+        Adds a regularly sampled series at a lower rate, materialized by linear interpolation at `sampling_rate`.
+
+        Parameters
+        ----------
+        name : str
+            Column name.
+        values : list or ndarray
+            Values.
+        rate : float
+            Sampling rate of the values.
+        start : int
+            Sample of the first value.
+        length : int
+            Number of samples of the column from `start`. None (default) stops at the last value.
+        """
+        values = np.asarray(values)
+        if length is None:
+            length = int((len(values) - 1)*self.sampling_rate/rate) + 1
+        self._add(name, u"resampled", start, start + length, values=values, rate=rate)
+
+    def update(self, signals):
+        u"""
+        Adds (or replaces) the columns of another SparseSignals.
+
+        Parameters
+        ----------
+        signals : SparseSignals
+            Columns to add.
+        """
+        for name in signals.columns:
+            if name not in self.data:
+                self.columns.append(name)
+            self.data[name] = signals.data[name]
+
+    def __len__(self):
+        return(max([column[u"end"] for column in self.data.values()] + [0]))
+
+    def __contains__(self, name):
+        return(name in self.data)
+
+    def __iter__(self):
+        return(iter(self.columns))
+
+    def keys(self):
+        return(list(self.columns))
+
+    def __getitem__(self, name):
+        column = self.data[name]
+        start, end = column[u"start"], column[u"end"]
+        kind = column[u"kind"]
+
+        if kind == u"signal":
+            values = column[u"values"]
+        elif kind == u"events":
+            values = np.full(end, np.nan)
+            values[column[u"indices"]] = 1
+        elif kind == u"intervals":
+            samples = np.arange(end)
+            interval = np.searchsorted(column[u"onsets"], samples, side=u"right") - 1
+            inside = (interval >= 0) & (samples < column[u"offsets"][np.maximum(interval, 0)])
+            values = np.full(end, column[u"fill"], dtype=np.result_type(column[u"values"], column[u"fill"]))
+            values[inside] = column[u"values"][interval[inside]]
+        elif kind == u"series":
+            if len(column[u"times"]) > 3:
+                values = discrete_to_continuous(column[u"values"], column[u"times"], self.sampling_rate).values[:end-start]
+            else:  # Sequence too short for a 3rd order spline
+                values = np.full(end-start, np.nan)
+        elif kind == u"resampled":
+            values = np.interp(np.arange(end-start)/self.sampling_rate, np.arange(len(column[u"values"]))/column[u"rate"], column[u"values"])
+
+        signal = pd.Series(values, index=np.arange(start, end), name=name)
+        if start > 0 or end < len(self):
+            signal = signal.reindex(np.arange(len(self)))
+        return(signal)
+
+    def to_dataframe(self, columns=None):
+        u"""
+        Materializes (all or some of) the columns in a DataFrame indexed by samples.
+
+        Parameters
+        ----------
+        columns : list
+            Columns to materialize. None (default) for all of them.
+
+        Returns
+        ----------
+        df : pd.DataFrame
+            Dense signals.
+        """
+        if columns is None:
+            columns = self.columns
+        df = pd.DataFrame(index=np.arange(len(self)))
+        for name in columns:
+            df[name] = self[name]
+        return(df)
+
+
+
+
 
 
 # ==============================================================================
@@ -283,61 +634,61 @@ def ecg_wave_detector(ecg, rpeaks):
     *Details*
 
     - **Cardiac Cycle**: A typical ECG showing a heartbeat consists of a P wave, a QRS complex and a T wave.The P wave represents the wave of depolarization that spreads from the SA-node throughout the atria. The QRS complex reflects the rapid depolarization of the right and left ventricles. Since the ventricles are the largest part of the heart, in terms of mass, the QRS complex usually has a much larger amplitude than the P-wave. The T wave represents the ventricular repolarization of the ventricles. On rare occasions, a U wave can be seen following the T wave. The U wave is believed to be related to the last remnants of ventricular repolarization.
+    - **Search windows**: The T wave is the maximum between the first quarter and the middle of the interval following each R peak, the P wave the maximum between the middle and the last quarter of the interval preceding each R peak, and the Q wave the minimum between each P wave and the following R peak. The windows of all beats are searched at once, so that the computation time grows linearly with the length of the recording.
 
     *Authors*
 
     - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
     """
-    t_waves = []
-    for index, rpeak in enumerate(rpeaks[0:-1]):
-        # T wave
-        middle = (rpeaks[index+1] - rpeak) / 2
-        quarter = middle/2
-
-        epoch = np.array(ecg)
-        epoch = epoch[int(rpeak+quarter):int(rpeak+middle)]
-
-        try:
-            t_wave = int(rpeak+quarter) + np.argmax(epoch)
-            t_waves.append(t_wave)
-        except ValueError:
-            pass
-
-    p_waves = []
-    for index, rpeak in enumerate(rpeaks[1:]):
-        index += 1
-        # Q wave
-        middle = (rpeak - rpeaks[index-1]) / 2
-        quarter = middle/2
-
-        epoch = np.array(ecg)
-        epoch = epoch[int(rpeak-middle):int(rpeak-quarter)]
-
-        try:
-            p_wave = int(rpeak-quarter) + np.argmax(epoch)
-            p_waves.append(p_wave)
-        except ValueError:
-            pass
-
-    q_waves = []
-    for index, p_wave in enumerate(p_waves):
-        epoch = np.array(ecg)
-        epoch = epoch[int(p_wave):int(rpeaks[rpeaks>p_wave][0])]
-
-        try:
-            q_wave = p_wave + np.argmin(epoch)
-            q_waves.append(q_wave)
-        except ValueError:
-            pass
+    ecg = np.asarray(ecg, dtype=float)
+    rpeaks = np.asarray(rpeaks)
+
+    middle = np.diff(rpeaks) / 2
+    quarter = middle / 2
+
+    # T wave
+    t_waves = _ecg_segment_argext(ecg, (rpeaks[:-1] + quarter).astype(int), (rpeaks[:-1] + middle).astype(int), np.maximum)
+
+    # P wave
+    p_waves = _ecg_segment_argext(ecg, (rpeaks[1:] - middle).astype(int), (rpeaks[1:] - quarter).astype(int), np.maximum)
+
+    # Q wave
+    following = np.searchsorted(rpeaks, p_waves, side=u"right")  # First R peak after each P wave
+    has_following = following < len(rpeaks)
+    q_waves = _ecg_segment_argext(ecg, p_waves[has_following], rpeaks[following[has_following]].astype(int), np.minimum)
 
     # TODO: manage to find the begininng of the Q and the end of the T wave so we can extract the QT interval
 
 
-    ecg_waves = {u"T_Waves": t_waves, u"P_Waves": p_waves, u"Q_Waves": q_waves}
+    ecg_waves = {u"T_Waves": list(t_waves), u"P_Waves": list(p_waves), u"Q_Waves": list(q_waves)}
     return(ecg_waves)
 
 
 
+def _ecg_segment_argext(signal, starts, ends, extremum=np.maximum):
+    u"""
+    Index of the (first) maximum (np.maximum) or minimum (np.minimum) of the signal in each segment [start, end). Empty segments are ignored.
+    """
+    ends = np.minimum(ends, len(signal))
+    lengths = ends - starts
+    nonempty = lengths > 0
+    starts = starts[nonempty]
+    lengths = lengths[nonempty]
+    if len(starts) == 0:
+        return(np.array([], dtype=int))
+
+    # All the segments, concatenated
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    positions = np.repeat(starts - offsets, lengths) + np.arange(np.sum(lengths))
+    values = signal[positions]
+
+    extrema = extremum.reduceat(values, offsets)
+    reached = np.flatnonzero(values == np.repeat(extrema, lengths))
+    first = reached[np.searchsorted(reached, offsets)]
+    return(positions[first])
+
+
+
 
 
 # ==============================================================================
@@ -348,7 +699,7 @@ def ecg_wave_detector(ecg, rpeaks):
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def ecg_systole(ecg, rpeaks, t_waves):
+def ecg_systole(ecg, rpeaks, t_waves, output=u"array"):
     u"""
     Returns the localization of systoles and diastoles.
 
@@ -360,16 +711,19 @@ def ecg_systole(ecg, rpeaks, t_waves):
         R peaks localization.
     t_waves : list or ndarray
         T waves localization.
+    output : str
+        "array" (default) returns the phase of each sample. "intervals" returns the onsets and offsets of the systoles.
 
     Returns
     ----------
-    systole : ndarray
-        Array indicating where systole (1) and diastole (0).
+    systole : ndarray or dict
+        Array (int8) indicating where systole (1) and diastole (0). If output is "intervals", a dict containing the onset ("Systole_Onsets") and the offset ("Systole_Offsets", exclusive) of each systole.
 
     Example
     ----------
     >>> import neurokit as nk
     >>> systole = nk.ecg_systole(ecg, rpeaks, t_waves)
+    >>> systoles = nk.ecg_systole(ecg, rpeaks, t_waves, output="intervals")
 
     Notes
     ----------
@@ -387,19 +741,26 @@ def ecg_systole(ecg, rpeaks, t_waves):
     - Edwards, L., Ring, C., McIntyre, D., & Carroll, D. (2001). Modulation of the human nociceptive flexion reflex across the cardiac cycle. Psychophysiology, 38(4), 712-718.
     - Gray, M. A., Rylander, K., Harrison, N. A., Wallin, B. G., & Critchley, H. D. (2009). Following one's heart: cardiac rhythms gate central initiation of sympathetic reflexes. Journal of Neuroscience, 29(6), 1817-1825.
     """
-    waves = np.array([u""]*len(ecg))
-    waves[rpeaks] = u"R"
-    waves[t_waves] = u"T"
-
-    systole = [0]
-    current = 0
-    for index, value in enumerate(waves[1:]):
-        if waves[index-1] == u"R":
-            current = 1
-        if waves[index-1] == u"T":
-            current = 0
-        systole.append(current)
-
+    # Systole starts at each R peak and ends at each T wave (which prevails if both are at the same sample)
+    waves = np.zeros(len(ecg), dtype=np.int8)
+    waves[np.asarray(rpeaks, dtype=int)] = 1
+    waves[np.asarray(t_waves, dtype=int)] = 2
+
+    events = np.flatnonzero(waves)
+    phases = (waves[events] == 1).astype(np.int8)
+
+    if output == u"intervals":
+        changes = np.diff(np.concatenate([[0], phases]))
+        onsets = events[changes == 1]
+        offsets = events[changes == -1]
+        if len(offsets) < len(onsets):
+            offsets = np.append(offsets, len(ecg))
+        return({u"Systole_Onsets": onsets, u"Systole_Offsets": offsets})
+
+    # Each phase lasts until the next event
+    systole = np.zeros(len(ecg), dtype=np.int8)
+    if len(events) > 0:
+        systole[events[0]:] = np.repeat(phases, np.diff(np.append(events, len(ecg))))
     return(systole)
 
 
@@ -7,7 +7,6 @@ from __future__ import absolute_import
 import numpy as np
 import pandas as pd
 import biosppy
-import mne
 import scipy
 
 from ..signal import *
@@ -88,6 +87,7 @@ def rsp_process(rsp, sampling_rate=1000):
         "0.4_0.5": [0.4, 0.5]}
 
 
+    import mne  # Heavy, only needed here
     power, freq = mne.time_frequency.psd_array_multitaper(rsp, sfreq=sampling_rate, fmin=0,
                                                           fmax=0.5, adaptive=False,
                                                           normalization='length')
@@ -4,11 +4,12 @@ from __future__ import absolute_import
 from ..miscellaneous import Time
 from ..miscellaneous import find_following_duplicates
 
-from ..signal import complexity
+from ..signal import complexity_batch
 
 from .eeg_data import eeg_to_df
 
 import pandas as pd
+import numpy as np
 
 
 # ==============================================================================
@@ -59,34 +60,25 @@ def eeg_complexity(eeg, sampling_rate, times=None, index=None, include=u"all", e
         if len(times) > 1 and verbose is True:
             print u"Computing complexity features... window " + unicode(time_window) + u"/" + unicode(len(times))
 
-        complexity_features = {}
-        # Compute complexity for each channel for each epoch
-        index = 0
+        # Channels × samples array of each epoch
+        signals = {}
         for epoch_index, epoch in data.items():
-            if len(times) == 1 and verbose is True:
-                print u"Computing complexity features... " + unicode(round(index/len(data.items())*100, 2)) + u"%"
-            index +=1
-
-            df = epoch[time_window[0]:time_window[1]].copy()
+            signals[epoch_index] = epoch[time_window[0]:time_window[1]].values.T
 
-            complexity_features[epoch_index] = {}
-            for channel in df:
-                signal = df[channel].values
-
-                features = complexity(signal, sampling_rate=sampling_rate, shannon=shannon, sampen=sampen, multiscale=multiscale, spectral=spectral, svd=svd, correlation=correlation, higushi=higushi, petrosian=petrosian, fisher=fisher, hurst=hurst, dfa=dfa, lyap_r=lyap_r, lyap_e=lyap_e)
+        # Compute complexity for all the channels of all the epochs of the same length at once
+        complexity_features = []
+        for length in set(signal.shape[1] for signal in signals.values()):
+            epochs = [epoch_index for epoch_index in signals.keys() if signals[epoch_index].shape[1] == length]
+            if len(times) == 1 and verbose is True:
+                print u"Computing complexity features... " + unicode(len(epochs)) + u" epochs of " + unicode(length) + u" samples"
 
-                for key, feature in features.items():
-                    if key in complexity_features[epoch_index].keys():
-                        complexity_features[epoch_index][key].append(feature)
-                    else:
-                        complexity_features[epoch_index][key] = [feature]
+            features = complexity_batch(np.concatenate([signals[epoch_index] for epoch_index in epochs]), sampling_rate=sampling_rate, shannon=shannon, sampen=sampen, multiscale=multiscale, spectral=spectral, svd=svd, correlation=correlation, higushi=higushi, petrosian=petrosian, fisher=fisher, hurst=hurst, dfa=dfa, lyap_r=lyap_r, lyap_e=lyap_e)
 
-        for epoch_index, epoch in complexity_features.items():
-            for feature in epoch:
-                complexity_features[epoch_index][feature] = pd.Series(complexity_features[epoch_index][feature]).mean()
+            # Average over channels
+            features.index = np.repeat(epochs, [len(signals[epoch_index]) for epoch_index in epochs])
+            complexity_features.append(features.groupby(level=0).mean())
+        complexity_features = pd.concat(complexity_features).sort_index()
 
-        # Convert to dataframe
-        complexity_features = pd.DataFrame.from_dict(complexity_features, orient=u"index")
         complexity_features.columns = [prefix[time_index] + u"_" + s for s in complexity_features.columns]
 
 
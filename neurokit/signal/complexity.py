@@ -3,7 +3,11 @@ from __future__ import division
 from __future__ import absolute_import
 import nolds
 import numpy as np
+import pandas as pd
+import scipy.spatial
 from itertools import izip
+import multiprocessing
+import time as builtin_time
 
 # ==============================================================================
 # ==============================================================================
@@ -13,7 +17,7 @@ from itertools import izip
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale=True, spectral=True, svd=True, correlation=True, higushi=True, petrosian=True, fisher=True, hurst=True, dfa=True, lyap_r=False, lyap_e=False, emb_dim=2, tolerance=u"default", k_max=8, bands=None, tau=1):
+def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale=True, spectral=True, svd=True, correlation=True, higushi=True, petrosian=True, fisher=True, hurst=True, dfa=True, lyap_r=False, lyap_e=False, emb_dim=2, tolerance=u"default", k_max=8, bands=None, tau=1, backend=u"neurokit", n_jobs=1, time_budget=None, pool=None):
     u"""
     Computes several chaos/complexity indices of a signal (including entropy, fractal dimensions, Hurst and Lyapunov exponent etc.).
 
@@ -28,7 +32,7 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
     sampen : bool
         Computes approximate sample entropy (sampen) using Chebychev and Euclidean distances.
     multiscale : bool
-        Computes multiscale entropy (MSE). Note that it uses the 'euclidean' distance.
+        Computes the complexity index (area under the curve) of the multiscale entropy (MSE).
     spectral : bool
         Computes Spectral Entropy.
     svd : bool
@@ -56,14 +60,22 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
     k_max : int
         The maximal value of k used for Higushi fractal dimension. The point at which the FD plateaus is considered a saturation point and that kmax value should be selected (Gómez, 2009). Some studies use a value of 8 or 16 for ECG signal and other 48 for MEG.
     bands : int
-        Used for spectral density. A list of numbers delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
+        Used for spectral density. A list of numbers (in increasing order) delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
     tau : int
         The delay. Used for fisher, svd, lyap_e and lyap_r.
+    backend : str
+        "neurokit" (default) uses the in-package estimators when available (the KD-tree based sampen and correlation dimension, which then share the same tree, and DFA). "nolds" delegates them to nolds.
+    n_jobs : int
+        Number of worker processes running the slow estimators (hurst, lyap_r, lyap_e, and correlation and dfa with the nolds backend) concurrently. 1 (default) computes everything in the current process. -1 uses one worker per slow estimator.
+    time_budget : float or dict
+        Wall-clock budget (in seconds) of each slow estimator, or a dict of budgets per estimator (e.g., {"lyap_r": 10, "default": 5}). Estimators exceeding it return NaN. In a dict, estimators without a budget take the one of "default" (no budget if absent). As an estimator running in the current process cannot be interrupted, it requires worker processes (n_jobs different from 1, or a pool): otherwise, a ValueError is raised.
+    pool : multiprocessing.Pool
+        Existing pool of worker processes running the slow estimators, instead of starting one for this call (n_jobs is then ignored). Reusing a pool over many signals avoids paying its start-up each time. It is neither closed nor terminated: estimators that exceeded their budget keep their worker busy until they finish.
 
     Returns
     ----------
     complexity : dict
-        Dict containing values for each indices.
+        Dict containing values for each indices. When n_jobs is not 1 (or with a pool), it also contains a "Status" dict with the reason ("timeout" or "error") of each index that failed.
 
 
     Example
@@ -73,6 +85,11 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
     >>>
     >>> signal = np.sin(np.log(np.random.sample(666)))
     >>> complexity = nk.complexity(signal)
+    >>> complexity = nk.complexity(signal, lyap_r=True, lyap_e=True, n_jobs=-1, time_budget=5)
+    >>>
+    >>> import multiprocessing
+    >>> pool = multiprocessing.Pool(4)
+    >>> results = [nk.complexity(signal, lyap_r=True, pool=pool, time_budget=5) for signal in signals]
 
     Notes
     ----------
@@ -98,6 +115,8 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
       - *DFA*: DFA measures the Hurst parameter H, which is very similar to the Hurst exponent. The main difference is that DFA can be used for non-stationary processes (whose mean and/or variance change over time).
       - *Lyap*: Positive Lyapunov exponents indicate chaos and unpredictability. Provides the algorithm of Rosenstein et al. (1993) to estimate the largest Lyapunov exponent and the algorithm of Eckmann et al. (1986) to estimate the whole spectrum of Lyapunov exponents.
 
+    - **Execution**: The slow estimators can take orders of magnitude longer than the others. With n_jobs different from 1, they are sent to a pool of worker processes while the fast ones are computed in the current process, and each of them is waited for at most its time budget (counted from the start of the computation, so that estimators queued behind others when n_jobs is lower than their number also consume their budget while waiting). The pool is terminated if an estimator timed out, unless it was passed by the caller (`pool`), in which case it is reused as is.
+
     *Authors*
 
     - Dominique Makowski (https://github.com/DominiqueMakowski)
@@ -125,126 +144,503 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
     - Costa, M., Goldberger, A. L., & Peng, C. K. (2005). Multiscale entropy analysis of biological signals. Physical review E, 71(2), 021906.
     """
 
-    if tolerance == u"default":
-        tolerance = 0.2*np.std(signal)
+    features = _complexity_requested([shannon, sampen, multiscale, spectral, svd, correlation, higushi, petrosian, fisher, hurst, dfa, lyap_r, lyap_e])
 
-    # Initialize results storing
-    complexity = {}
+    signal = np.asarray(signal, dtype=float)
+    plan = ComplexityPlan(len(signal), sampling_rate=sampling_rate, features=features, emb_dim=emb_dim, tolerance=tolerance, k_max=k_max, bands=bands, tau=tau, backend=backend)
+    complexity = plan.compute(signal, n_jobs=n_jobs, time_budget=time_budget, pool=pool)
+    return(complexity)
 
 
-# ------------------------------------------------------------------------------
 
-    # Shannon
-    if shannon is True:
-        try:
-            complexity[u"Entropy_Shannon"] = complexity_entropy_shannon(signal)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute Shannon entropy."
-            complexity[u"Entropy_Shannon"] = np.nan
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+class ComplexityPlan(object):
+    u"""
+    A reusable plan computing a set of complexity indices on signals of a given length. The intermediate results shared by several indices (tolerance, template matches, singular values, power spectrum) are computed only once per signal, and the ones depending only on the signal length (Higushi weights, frequency band index) only once per plan.
 
-    # Sampen
-    if sampen is True:
-        try:
-            complexity[u"Entropy_Sample"] = nolds.sampen(signal, emb_dim, tolerance, dist=u"chebychev", debug_plot=False, plot_file=None)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute sample entropy (sampen)."
-            complexity[u"Entropy_Sample"] = np.nan
+    Its methods (functions) are:
+        - compute()
+    See those for further informations.
 
+    Parameters
+    ----------
+    n_samples : int
+        Length of the signals the plan will be applied to.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    features : list
+        Indices to compute, among "shannon", "sampen", "multiscale", "spectral", "svd", "correlation", "higushi", "petrosian", "fisher", "hurst", "dfa", "lyap_r" and "lyap_e". If None, all but the Lyapunov exponents (the defaults of complexity()).
+    emb_dim : int
+        The embedding dimension (*m*, the length of vectors to compare). Used in sampen, fisher, svd and fractal_dim.
+    tolerance : float
+        Distance *r* threshold for two template vectors to be considered equal. Default is 0.2*std(signal), computed for each signal. Used in sampen and fractal_dim.
+    k_max : int
+        The maximal value of k used for Higushi fractal dimension.
+    bands : int
+        Used for spectral density. A list of numbers (in increasing order) delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
+    tau : int
+        The delay. Used for fisher, svd, lyap_e and lyap_r.
+    backend : str
+        "neurokit" (default) uses the in-package estimators when available (e.g., the KD-tree based sampen). "nolds" delegates them to nolds.
 
-    # multiscale
-    if multiscale is True:
-        try:
-            complexity[u"Entropy_Multiscale"] = complexity_entropy_multiscale(signal, emb_dim, tolerance)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute Multiscale Entropy (MSE)."
-            complexity[u"Entropy_Multiscale"] = np.nan
+    Returns
+    ----------
+    None
 
-    # spectral
-    if spectral is True:
-        try:
-            complexity[u"Entropy_Spectral"] = complexity_entropy_spectral(signal, sampling_rate=sampling_rate, bands=bands)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute Spectral Entropy."
-            complexity[u"Entropy_Spectral"] = np.nan
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> signals = np.sin(np.log(np.random.sample((10, 666))))
+    >>> plan = nk.ComplexityPlan(666, features=["sampen", "multiscale", "svd", "fisher"])
+    >>> complexity = [plan.compute(signal) for signal in signals]
+    >>>
+    >>> import multiprocessing
+    >>> pool = multiprocessing.Pool(2)  # Started once, reused for all signals
+    >>> plan = nk.ComplexityPlan(666, features=["sampen", "hurst"])
+    >>> complexity = [plan.compute(signal, pool=pool, time_budget=5) for signal in signals]
 
-    # SVD
-    if svd is True:
-        try:
-            complexity[u"Entropy_SVD"] = complexity_entropy_svd(signal, tau=tau, emb_dim=emb_dim)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute SVD Entropy."
-            complexity[u"Entropy_SVD"] = np.nan
+    Notes
+    ----------
+    *Details*
 
-# ------------------------------------------------------------------------------
-    # fractal_dim
-    if correlation is True:
-        try:
-            complexity[u"Fractal_Dimension_Correlation"] = nolds.corr_dim(signal, emb_dim, rvals=None, fit=u"RANSAC", debug_plot=False, plot_file=None)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute fractal_dim."
-            complexity[u"Fractal_Dimension_Correlation"] = np.nan
+    - **Dependencies**: Each index lists the intermediates it needs (see `ComplexityPlan.dependencies`). The sample entropy and the first scale of the multiscale entropy share the same template matches (when computed with the "neurokit" backend), the SVD entropy and the Fisher information share the singular values of the embedded signal.
 
-    # higushi
-    if higushi is True:
-        try:
-            complexity[u"Fractal_Dimension_Higushi"] = complexity_fd_higushi(signal, k_max)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute higushi."
-            complexity[u"Fractal_Dimension_Higushi"] = np.nan
+    *Authors*
 
-    # petrosian
-    if petrosian is True:
-        try:
-            complexity[u"Fractal_Dimension_Petrosian"] = complexity_fd_petrosian(signal)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute petrosian."
-            complexity[u"Fractal_Dimension_Petrosian"] = np.nan
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
 
-# ------------------------------------------------------------------------------
+    *Dependencies*
 
-    # Fisher
-    if fisher is True:
-        try:
-            complexity[u"Fisher_Information"] = complexity_fisher_info(signal, tau=tau, emb_dim=emb_dim)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute Fisher Information."
-            complexity[u"Fisher_Information"] = np.nan
+    - nolds
+    - numpy
+    - scipy
 
+    *See Also*
+
+    - complexity()
+    """
+    # Output key and name (for warnings) of each index
+    outputs = {u"shannon": (u"Entropy_Shannon", u"Shannon entropy"),
+               u"sampen": (u"Entropy_Sample", u"sample entropy (sampen)"),
+               u"multiscale": (u"Entropy_Multiscale_AUC", u"Multiscale Entropy (MSE)"),
+               u"spectral": (u"Entropy_Spectral", u"Spectral Entropy"),
+               u"svd": (u"Entropy_SVD", u"SVD Entropy"),
+               u"correlation": (u"Fractal_Dimension_Correlation", u"fractal_dim"),
+               u"higushi": (u"Fractal_Dimension_Higushi", u"higushi"),
+               u"petrosian": (u"Fractal_Dimension_Petrosian", u"petrosian"),
+               u"fisher": (u"Fisher_Information", u"Fisher Information"),
+               u"hurst": (u"Hurst", u"hurst"),
+               u"dfa": (u"DFA", u"dfa"),
+               u"lyap_r": (u"Lyapunov_R", u"lyap_r"),
+               u"lyap_e": (u"Lyapunov_E", u"lyap_e")}
+
+    # Intermediates needed by each index
+    dependencies = {u"shannon": [],
+                    u"sampen": [u"tolerance", u"embedding_tree", u"sampen_counts"],
+                    u"multiscale": [u"tolerance", u"embedding_tree", u"sampen_counts"],
+                    u"spectral": [u"psd"],
+                    u"svd": [u"singular_values"],
+                    u"correlation": [u"embedding_tree"],
+                    u"higushi": [],
+                    u"petrosian": [],
+                    u"fisher": [u"singular_values"],
+                    u"hurst": [],
+                    u"dfa": [],
+                    u"lyap_r": [],
+                    u"lyap_e": []}
+
+    # Slow indices, sent to the worker pool when n_jobs is not 1 (correlation and dfa only with the nolds backend)
+    pooled = [u"correlation", u"hurst", u"dfa", u"lyap_r", u"lyap_e"]
+
+    order = [u"shannon", u"sampen", u"multiscale", u"spectral", u"svd", u"correlation", u"higushi", u"petrosian", u"fisher", u"hurst", u"dfa", u"lyap_r", u"lyap_e"]
+
+    def __init__(self, n_samples, sampling_rate=1000, features=None, emb_dim=2, tolerance=u"default", k_max=8, bands=None, tau=1, backend=u"neurokit"):
+        if features is None:
+            features = [feature for feature in self.order if feature not in [u"lyap_r", u"lyap_e"]]
+        for feature in features:
+            if feature not in self.outputs:
+                raise ValueError(u"NeuroKit error: ComplexityPlan(): unknown feature '" + feature + u"'.")
+
+        self.n_samples = n_samples
+        self.sampling_rate = sampling_rate
+        self.features = [feature for feature in self.order if feature in features]
+        self.emb_dim = emb_dim
+        self.tolerance = tolerance
+        self.k_max = k_max
+        self.bands = bands
+        self.tau = tau
+        self.backend = backend
+        if backend == u"neurokit":
+            self.pooled = [feature for feature in self.pooled if feature not in [u"correlation", u"dfa"]]
+
+        # Shared intermediates, in order of first use (the nolds backend does not use the KD-tree)
+        self.intermediates = []
+        for feature in self.features:
+            for intermediate in self.dependencies[feature]:
+                if backend != u"neurokit" and intermediate in [u"embedding_tree", u"sampen_counts"] and feature != u"multiscale":
+                    continue
+                if intermediate not in self.intermediates:
+                    self.intermediates.append(intermediate)
+
+        # Length-dependent setup, paid once per plan
+        if u"higushi" in self.features:
+            self.higushi_weights = _complexity_higushi_weights(n_samples, k_max)
+        if u"spectral" in self.features:
+            self.band_starts = _complexity_spectral_bands(n_samples, sampling_rate, bands)
+
+
+    def compute(self, signal, n_jobs=1, time_budget=None, pool=None):
+        u"""
+        Computes the planned indices of a signal.
+
+        Parameters
+        ----------
+        signal : list or array
+            List or array of n_samples values.
+        n_jobs : int
+            Number of worker processes running the slow indices (see `ComplexityPlan.pooled`) concurrently. 1 (default) computes everything in the current process. -1 uses one worker per slow index.
+        time_budget : float or dict
+            Wall-clock budget (in seconds) of each slow index, or a dict of budgets per index. Indices exceeding it return NaN. In a dict, indices without a budget take the one of "default" (no budget if absent). As an index computed in the current process cannot be interrupted, it requires worker processes (n_jobs different from 1, or a pool): otherwise, a ValueError is raised.
+        pool : multiprocessing.Pool
+            Existing pool of worker processes running the slow indices, reused across calls (n_jobs is then ignored). It is neither closed nor terminated.
+
+        Returns
+        ----------
+        complexity : dict
+            Dict containing values for each indices. When n_jobs is not 1 (or with a pool), it also contains a "Status" dict with the reason ("timeout" or "error") of each index that failed.
+
+        Example
+        ----------
+        >>> import neurokit as nk
+        >>> plan = nk.ComplexityPlan(666)
+        >>> complexity = plan.compute(np.random.normal(size=666))
+        """
+        signal = np.asarray(signal, dtype=float)
+        if len(signal) != self.n_samples:
+            raise ValueError(u"NeuroKit error: ComplexityPlan.compute(): the plan was built for signals of " + unicode(self.n_samples) + u" samples.")
+        workers = n_jobs != 1 or pool is not None
+        if workers is False and time_budget is not None:
+            raise ValueError(u"NeuroKit error: ComplexityPlan.compute(): time_budget requires n_jobs to be different from 1 (or a pool).")
+
+        pooled = []
+        if workers is True:
+            pooled = [feature for feature in self.features if feature in self.pooled]
+
+        # Send the slow indices to the workers first, so that they run while the fast ones are computed here
+        own_pool = pool is None and len(pooled) > 0
+        if len(pooled) > 0:
+            if own_pool is True:
+                if n_jobs < 1:
+                    n_jobs = len(pooled)
+                pool = multiprocessing.Pool(processes=min(n_jobs, len(pooled)))
+            start = builtin_time.time()
+            results = [pool.apply_async(_complexity_plan_feature, (self, feature, signal)) for feature in pooled]
+
+        cache = {u"signal": signal}
+        complexity = {}
+        status = {}
+        for feature in self.features:
+            if feature in pooled:
+                continue
+            try:
+                complexity.update(getattr(self, u"_feature_" + feature)(cache))
+            except:
+                self._fail(feature, complexity, status, u"error")
+
+        if len(pooled) > 0:
+            timed_out = False
+            for feature, result in izip(pooled, results):
+                budget = time_budget
+                if isinstance(time_budget, dict):
+                    budget = time_budget.get(feature, time_budget.get(u"default"))
+                try:
+                    if budget is None:
+                        complexity.update(result.get())
+                    else:
+                        complexity.update(result.get(timeout=max(0, start + budget - builtin_time.time())))
+                except multiprocessing.TimeoutError:
+                    timed_out = True
+                    self._fail(feature, complexity, status, u"timeout")
+                except:
+                    self._fail(feature, complexity, status, u"error")
+
+            if own_pool is True:
+                if timed_out is True:
+                    pool.terminate()  # Do not wait for the estimators still running
+                else:
+                    pool.close()
+                pool.join()
+
+        if workers is True:
+            complexity[u"Status"] = status
+        return(complexity)
+
+
+    def _fail(self, feature, complexity, status, reason):
+        u"""
+        Stores NaN (and the reason) for an index that could not be computed.
+        """
+        key, name = self.outputs[feature]
+        if reason == u"timeout":
+            print u"NeuroKit warning: complexity(): " + name + u" exceeded its time budget."
+        else:
+            print u"NeuroKit warning: complexity(): Failed to compute " + name + u"."
+        complexity[key] = np.nan
+        status[key] = reason
+
+
+    def _get(self, cache, intermediate):
+        u"""
+        Computes an intermediate, or retrieves it if already computed for this signal.
+        """
+        if intermediate not in cache:
+            cache[intermediate] = getattr(self, u"_intermediate_" + intermediate)(cache)
+        return(cache[intermediate])
+
+    # Intermediates
+    # --------------
+    def _intermediate_tolerance(self, cache):
+        if self.tolerance == u"default":
+            return(0.2*np.std(cache[u"signal"]))
+        return(self.tolerance)
+
+    def _intermediate_embedding_tree(self, cache):
+        return(_complexity_embedding_tree(cache[u"signal"], self.emb_dim))
+
+    def _intermediate_sampen_counts(self, cache):
+        return(_complexity_sampen_counts(cache[u"signal"], self.emb_dim, self._get(cache, u"tolerance"), tree=self._get(cache, u"embedding_tree")))
+
+    def _intermediate_singular_values(self, cache):
+        return(_complexity_singular_values(cache[u"signal"], tau=self.tau, emb_dim=self.emb_dim))
+
+    def _intermediate_psd(self, cache):
+        return(np.abs(np.fft.rfft(cache[u"signal"]))**2)
+
+    # Indices
+    # --------------
+    def _feature_shannon(self, cache):
+        return({u"Entropy_Shannon": complexity_entropy_shannon(cache[u"signal"])})
+
+    def _feature_sampen(self, cache):
+        if self.backend == u"neurokit":
+            sample_entropy = _complexity_entropy_sample(self._get(cache, u"sampen_counts"))
+        else:
+            sample_entropy = complexity_entropy_sample(cache[u"signal"], self.emb_dim, self._get(cache, u"tolerance"), distance=u"chebychev", backend=self.backend)
+        return({u"Entropy_Sample": sample_entropy})
+
+    def _feature_multiscale(self, cache):
+        scales = np.arange(1, 21)
+        values = _complexity_mse_values(cache[u"signal"], self.emb_dim, self._get(cache, u"tolerance"), scales, counts={1: self._get(cache, u"sampen_counts")})
+        finite = np.isfinite(values)
+        return({u"Entropy_Multiscale_AUC": np.trapz(values[finite], scales[finite])})
+
+    def _feature_spectral(self, cache):
+        return({u"Entropy_Spectral": _complexity_entropy_spectral(self._get(cache, u"psd"), self.band_starts)})
+
+    def _feature_svd(self, cache):
+        return({u"Entropy_SVD": _complexity_entropy_svd(self._get(cache, u"singular_values"))})
+
+    def _feature_correlation(self, cache):
+        if self.backend == u"neurokit":
+            fd_correlation = _complexity_fd_correlation(self._get(cache, u"embedding_tree"), self.n_samples, np.std(cache[u"signal"]), fit=u"RANSAC")
+        else:
+            fd_correlation = nolds.corr_dim(cache[u"signal"], self.emb_dim, rvals=None, fit=u"RANSAC", debug_plot=False, plot_file=None)
+        return({u"Fractal_Dimension_Correlation": fd_correlation})
+
+    def _feature_higushi(self, cache):
+        return({u"Fractal_Dimension_Higushi": _complexity_fd_higushi(cache[u"signal"][np.newaxis], self.higushi_weights)[0]})
+
+    def _feature_petrosian(self, cache):
+        return({u"Fractal_Dimension_Petrosian": complexity_fd_petrosian(cache[u"signal"])})
+
+    def _feature_fisher(self, cache):
+        return({u"Fisher_Information": _complexity_fisher_info(self._get(cache, u"singular_values"))})
+
+    def _feature_hurst(self, cache):
+        return({u"Hurst": nolds.hurst_rs(cache[u"signal"], nvals=None, fit=u"RANSAC", debug_plot=False, plot_file=None)})
+
+    def _feature_dfa(self, cache):
+        if self.backend == u"neurokit":
+            dfa = complexity_dfa(cache[u"signal"], nvals=None, overlap=True, order=1, fit=u"RANSAC")
+        else:
+            dfa = nolds.dfa(cache[u"signal"], nvals=None, overlap=True, order=1, fit_trend=u"poly", fit_exp=u"RANSAC", debug_plot=False, plot_file=None)
+        return({u"DFA": dfa})
+
+    def _feature_lyap_r(self, cache):
+        return({u"Lyapunov_R": nolds.lyap_r(cache[u"signal"], emb_dim=10, lag=None, min_tsep=None, tau=self.tau, min_vectors=20, trajectory_len=20, fit=u"RANSAC", debug_plot=False, plot_file=None)})
+
+    def _feature_lyap_e(self, cache):
+        result = nolds.lyap_e(cache[u"signal"], emb_dim=10, matrix_dim=4, min_nb=None, min_tsep=0, tau=self.tau, debug_plot=False, plot_file=None)
+        return(dict((u"Lyapunov_E_" + unicode(i), value) for i, value in enumerate(result)))
 
-    # Hurst
-    if hurst is True:
-        try:
-            complexity[u"Hurst"] = nolds.hurst_rs(signal, nvals=None, fit=u"RANSAC", debug_plot=False, plot_file=None)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute hurst."
-            complexity[u"Hurst"] = np.nan
 
-    # DFA
-    if dfa is True:
-        try:
-            complexity[u"DFA"] = nolds.dfa(signal, nvals=None, overlap=True, order=1, fit_trend=u"poly", fit_exp=u"RANSAC", debug_plot=False, plot_file=None)
-        except:
-            print u"NeuroKit warning: complexity(): Failed to compute dfa."
-            complexity[u"DFA"] = np.nan
 
-    # Lyap_r
-    if lyap_r is True:
+def _complexity_plan_feature(plan, feature, signal):
+    u"""
+    Computes one index of a ComplexityPlan in a worker process (bound methods cannot be pickled).
+    """
+    return(getattr(plan, u"_feature_" + feature)({u"signal": signal}))
+
+
+
+def _complexity_requested(requested):
+    u"""
+    Names of the requested indices, from the list of booleans of complexity() (in ComplexityPlan.order).
+    """
+    return([feature for feature, flag in izip(ComplexityPlan.order, requested) if flag is True])
+
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def complexity_batch(array, axis=-1, sampling_rate=1000, shannon=True, sampen=True, multiscale=True, spectral=True, svd=True, correlation=True, higushi=True, petrosian=True, fisher=True, hurst=True, dfa=True, lyap_r=False, lyap_e=False, emb_dim=2, tolerance=u"default", k_max=8, bands=None, tau=1, backend=u"neurokit"):
+    u"""
+    Computes the complexity indices of many signals of the same length at once (e.g., channels × samples).
+
+    Parameters
+    ----------
+    array : array or DataFrame
+        2D array of signals (n_signals × n_samples if axis=-1, n_samples × n_signals if axis=0).
+    axis : int
+        The time axis.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    shannon, sampen, multiscale, spectral, svd, correlation, higushi, petrosian, fisher, hurst, dfa, lyap_r, lyap_e : bool
+        Indices to compute. See complexity().
+    emb_dim : int
+        The embedding dimension (*m*, the length of vectors to compare). Used in sampen, fisher, svd and fractal_dim.
+    tolerance : float
+        Distance *r* threshold for two template vectors to be considered equal. Default is 0.2*std(signal), computed for each signal. Used in sampen and fractal_dim.
+    k_max : int
+        The maximal value of k used for Higushi fractal dimension.
+    bands : int
+        Used for spectral density. A list of numbers (in increasing order) delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
+    tau : int
+        The delay. Used for fisher, svd, lyap_e and lyap_r.
+    backend : str
+        "neurokit" (default) uses the in-package estimators when available (e.g., the KD-tree based sampen). "nolds" delegates them to nolds.
+
+    Returns
+    ----------
+    complexity : pandas.DataFrame
+        One row per signal (indexed by the DataFrame's columns or index if a DataFrame was given), one column per index (named as the keys returned by complexity()).
+
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> channels = np.sin(np.log(np.random.sample((64, 666))))
+    >>> complexity = nk.complexity_batch(channels)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Vectorization**: Shannon entropy, spectral entropy, SVD entropy, Fisher information, Higushi and Petrosian fractal dimensions and DFA (with the "neurokit" backend) are computed for all signals at once, as array operations along the time axis. The other indices (based on neighbour searches or on nolds) are computed signal by signal through a single ComplexityPlan.
+
+    *Authors*
+
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
+
+    *Dependencies*
+
+    - numpy
+    - pandas
+    - nolds
+
+    *See Also*
+
+    - complexity()
+    - ComplexityPlan
+    """
+    index = None
+    if isinstance(array, pd.DataFrame):
+        if axis == 0:
+            index = array.columns
+        else:
+            index = array.index
+
+    array = np.asarray(array, dtype=float)
+    if array.ndim == 1:
+        array = array[np.newaxis]
+    elif axis not in [-1, array.ndim - 1]:
+        array = np.swapaxes(array, axis, -1)
+    if array.ndim != 2:
+        raise ValueError(u"NeuroKit error: complexity_batch(): array should be 2D (signals × samples).")
+    array = np.ascontiguousarray(array)
+    n_signals, n_samples = array.shape
+    if index is None:
+        index = np.arange(n_signals)
+
+    features = _complexity_requested([shannon, sampen, multiscale, spectral, svd, correlation, higushi, petrosian, fisher, hurst, dfa, lyap_r, lyap_e])
+    vectorized = [u"shannon", u"spectral", u"svd", u"fisher", u"higushi", u"petrosian"]
+    if backend == u"neurokit":
+        vectorized.append(u"dfa")
+
+    # Signal by signal
+    plan = ComplexityPlan(n_samples, sampling_rate=sampling_rate, features=[feature for feature in features if feature not in vectorized], emb_dim=emb_dim, tolerance=tolerance, k_max=k_max, bands=bands, tau=tau, backend=backend)
+    if len(plan.features) > 0:
+        complexity = pd.DataFrame([plan.compute(signal) for signal in array], index=index)
+    else:
+        complexity = pd.DataFrame(index=index)
+
+    # All signals at once
+    singular_values = None
+    if svd is True or fisher is True:
         try:
-            complexity[u"Lyapunov_R"] = nolds.lyap_r(signal, emb_dim=10, lag=None, min_tsep=None, tau=tau, min_vectors=20, trajectory_len=20, fit=u"RANSAC", debug_plot=False, plot_file=None)
+            singular_values = _complexity_singular_values(array, tau=tau, emb_dim=emb_dim)
         except:
-            print u"NeuroKit warning: complexity(): Failed to compute lyap_r."
-            complexity[u"Lyapunov_R"] = np.nan
+            pass
 
-    # Lyap_e
-    if lyap_e is True:
+    for feature in features:
+        if feature not in vectorized:
+            continue
+        key, name = ComplexityPlan.outputs[feature]
         try:
-            result = nolds.lyap_e(signal, emb_dim=10, matrix_dim=4, min_nb=None, min_tsep=0, tau=tau, debug_plot=False, plot_file=None)
-            for i, value in enumerate(result):
-                complexity[u"Lyapunov_E_" + unicode(i)] = value
+            if feature == u"shannon":
+                values = complexity_entropy_shannon(array)
+            elif feature == u"spectral":
+                psd = np.abs(np.fft.rfft(array, axis=-1))**2
+                values = _complexity_entropy_spectral(psd, _complexity_spectral_bands(n_samples, sampling_rate, bands))
+            elif feature == u"svd":
+                values = _complexity_entropy_svd(singular_values)
+            elif feature == u"fisher":
+                values = _complexity_fisher_info(singular_values)
+            elif feature == u"higushi":
+                values = complexity_fd_higushi(array, k_max)
+            elif feature == u"petrosian":
+                values = complexity_fd_petrosian(array)
+            elif feature == u"dfa":
+                values = complexity_dfa(array)
+            complexity[key] = values
         except:
-            print u"NeuroKit warning: complexity(): Failed to compute lyap_e."
-            complexity[u"Lyapunov_E"] = np.nan
-
+            print u"NeuroKit warning: complexity_batch(): Failed to compute " + name + u"."
+            complexity[key] = np.nan
+
+    # Same order as complexity()
+    columns = []
+    for feature in features:
+        key = ComplexityPlan.outputs[feature][0]
+        columns += [column for column in complexity.columns if column == key or (feature == u"lyap_e" and column.startswith(key))]
+    complexity = complexity[columns]
     return(complexity)
 
 
@@ -257,20 +653,256 @@ def complexity(signal, sampling_rate=1000, shannon=True, sampen=True, multiscale
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def complexity_entropy_shannon(signal):
+def complexity_rolling(signal, window, step=1, sampling_rate=1000, features=None, emb_dim=2, tolerance=u"default", k_max=8, bands=None, tau=1, backend=u"neurokit"):
     u"""
-    Computes the shannon entropy. Copied from the `pyEntropy <https://github.com/nikdon/pyEntropy>`_ repo by tjugo.
+    Computes complexity indices over sliding windows of a signal, updating them incrementally from one window to the next when possible.
 
     Parameters
     ----------
     signal : list or array
         List or array of values.
+    window : int
+        Length of the windows (in samples).
+    step : int
+        Number of samples between the onsets of two successive windows.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    features : list
+        Indices to compute (see ComplexityPlan). Default is ["shannon", "sampen", "spectral", "petrosian"], the indices updated incrementally.
+    emb_dim : int
+        The embedding dimension (*m*, the length of vectors to compare). Used in sampen, fisher, svd and fractal_dim.
+    tolerance : float
+        Distance *r* threshold for two template vectors to be considered equal. Default is 0.2*std(signal), computed once on the whole signal and used for all the windows.
+    k_max : int
+        The maximal value of k used for Higushi fractal dimension.
+    bands : int
+        Used for spectral density. A list of numbers (in increasing order) delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
+    tau : int
+        The delay. Used for fisher, svd, lyap_e and lyap_r.
+    backend : str
+        "neurokit" (default) uses the in-package estimators when available. "nolds" delegates them to nolds (in which case sampen is not updated incrementally).
+
+    Returns
+    ----------
+    complexity : pandas.DataFrame
+        One row per window (indexed by the onset sample of the window), one column per index (named as the keys returned by complexity()).
+
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> signal = np.sin(np.log(np.random.sample(60000)))
+    >>> complexity = nk.complexity_rolling(signal, window=30000, step=1000)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Incremental updates**: Going from a window to the next one, only the samples entering and leaving the window are processed for the Shannon entropy (symbol counts), the Petrosian FD (sign changes of the derivative, from a cumulative sum) and the sample entropy (matches of the entering and leaving templates with the rest of the window). The spectrum used for the spectral entropy is updated with a sliding DFT when the step is small compared to the window (and recomputed every `window` updates to avoid accumulating rounding errors), otherwise computed with one FFT per window. For large steps, the sample entropy of each window is recomputed from scratch. The other indices are computed with complexity_batch() on the windows.
+    - **Tolerance**: As the match counts of the sample entropy are carried over from one window to the next, the same tolerance is used for all windows. Values are thus comparable across windows but can differ from complexity() applied to each window (which uses the tolerance of the window).
+
+    *Authors*
+
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
+
+    *Dependencies*
+
+    - numpy
+    - pandas
+
+    *See Also*
+
+    - complexity_batch()
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    if features is None:
+        features = [u"shannon", u"sampen", u"spectral", u"petrosian"]
+    for feature in features:
+        if feature not in ComplexityPlan.outputs:
+            raise ValueError(u"NeuroKit error: complexity_rolling(): unknown feature '" + feature + u"'.")
+    features = [feature for feature in ComplexityPlan.order if feature in features]
+
+    if window > len(signal):
+        raise ValueError(u"NeuroKit error: complexity_rolling(): window is longer than the signal.")
+    starts = np.arange(0, len(signal) - window + 1, step)
+
+    if tolerance == u"default":
+        tolerance = 0.2*np.std(signal)
+
+    incremental = [u"shannon", u"spectral", u"petrosian"]
+    if backend == u"neurokit":
+        incremental.append(u"sampen")
+
+    complexity = pd.DataFrame(index=starts)
+    for feature in features:
+        if feature not in incremental:
+            continue
+        key, name = ComplexityPlan.outputs[feature]
+        if feature == u"shannon":
+            complexity[key] = _complexity_rolling_shannon(signal, starts, window)
+        elif feature == u"sampen":
+            complexity[key] = _complexity_rolling_sampen(signal, starts, window, emb_dim, tolerance)
+        elif feature == u"spectral":
+            complexity[key] = _complexity_rolling_spectral(signal, starts, window, _complexity_spectral_bands(window, sampling_rate, bands))
+        elif feature == u"petrosian":
+            complexity[key] = _complexity_rolling_petrosian(signal, starts, window)
+
+    # Other indices, by chunks of windows (strided views of the signal)
+    others = [feature for feature in features if feature not in incremental]
+    if len(others) > 0:
+        windows = _embed_seq(signal, 1, window)[::step]
+        requested = dict((feature, feature in others) for feature in ComplexityPlan.order)
+        batch = []
+        for chunk in xrange(0, len(windows), 256):
+            batch.append(complexity_batch(windows[chunk:chunk + 256], sampling_rate=sampling_rate, emb_dim=emb_dim, tolerance=tolerance, k_max=k_max, bands=bands, tau=tau, backend=backend, **requested))
+        batch = pd.concat(batch)
+        for column in batch.columns:
+            complexity[column] = batch[column].values
+
+    # Same order as complexity()
+    columns = []
+    for feature in features:
+        key = ComplexityPlan.outputs[feature][0]
+        columns += [column for column in complexity.columns if column == key or (feature == u"lyap_e" and column.startswith(key))]
+    complexity = complexity[columns]
+    return(complexity)
+
+
+
+def _complexity_rolling_shannon(signal, starts, window):
+    u"""
+    Shannon entropy of each window, updating the symbol counts with the entering and leaving samples.
+    """
+    symbols = np.unique(signal, return_inverse=True)[1]
+    n_symbols = symbols.max() + 1
+
+    # Entropy = log2(window) - sum(c * log2(c)) / window
+    def count_log_count(counts):
+        return(np.sum(counts * np.log2(np.where(counts > 0, counts, 1))))
+
+    values = np.zeros(len(starts))
+    previous = None
+    for index, start in enumerate(starts):
+        if previous is None or start - previous >= window:
+            counts = np.bincount(symbols[start:start + window], minlength=n_symbols)
+            total = count_log_count(counts)
+        else:
+            leaving = symbols[previous:start]
+            entering = symbols[previous + window:start + window]
+            changed = np.unique(np.concatenate([leaving, entering]))
+            total -= count_log_count(counts[changed])
+            np.subtract.at(counts, leaving, 1)
+            np.add.at(counts, entering, 1)
+            total += count_log_count(counts[changed])
+        values[index] = np.log2(window) - total / window
+        previous = start
+    return(values)
+
+
+
+def _complexity_rolling_petrosian(signal, starts, window):
+    u"""
+    Petrosian FD of each window, counting the sign changes of the derivative with a cumulative sum.
+    """
+    diff = np.diff(signal)
+    changes = np.concatenate([[0], np.cumsum(diff[1:] * diff[:-1] < 0)])
+    N_delta = changes[starts + window - 3] - changes[starts]
+    fd_petrosian = np.log(window)/(np.log(window)+np.log(window/(window+0.4*N_delta)))
+    return(fd_petrosian)
+
+
+
+def _complexity_rolling_spectral(signal, starts, window, band_starts=None):
+    u"""
+    Spectral entropy of each window, from a sliding DFT for small steps or one FFT per window otherwise.
+    """
+    step = starts[1] - starts[0] if len(starts) > 1 else window
+    if step >= np.log2(window):
+        windows = _embed_seq(signal, 1, window)[starts[0]::step]
+        values = [_complexity_entropy_spectral(np.abs(np.fft.rfft(windows[chunk:chunk + 256], axis=-1))**2, band_starts) for chunk in xrange(0, len(windows), 256)]
+        return(np.concatenate(values))
+
+    # Sliding DFT: X(a+1) = (X(a) - x[a] + x[a+window]) * exp(2i * pi * k / window)
+    rotation = np.exp(2j * np.pi * np.arange(window // 2 + 1) / window)
+    spectrum = np.fft.rfft(signal[starts[0]:starts[0] + window])
+    position = starts[0]
+    updates = 0
+
+    values = np.zeros(len(starts))
+    for index, start in enumerate(starts):
+        while position < start:
+            spectrum = (spectrum - signal[position] + signal[position + window]) * rotation
+            position += 1
+            updates += 1
+            if updates % window == 0:  # Avoid accumulating rounding errors
+                spectrum = np.fft.rfft(signal[position:position + window])
+        values[index] = _complexity_entropy_spectral(np.abs(spectrum)**2, band_starts)
+    return(values)
+
+
+
+def _complexity_rolling_sampen(signal, starts, window, emb_dim, tolerance):
+    u"""
+    Sample entropy of each window, updating the match counts with the matches of the entering and leaving templates (for small steps).
+    """
+    n_templates = window - emb_dim
+    step = starts[1] - starts[0] if len(starts) > 1 else window
+    if step * 10 >= n_templates or tolerance <= 0:  # Recomputing is then cheaper than 2 * step template comparisons
+        return(np.array([_complexity_entropy_sample(_complexity_sampen_counts(signal[start:start + window], emb_dim, tolerance)) for start in starts]))
+
+    templates = _embed_seq(signal, 1, emb_dim + 1)
+
+    # Number of templates of length emb_dim and emb_dim+1 similar to the template i among the templates in [start, end)
+    def matches(i, start, end):
+        distances = np.abs(templates[start:end] - templates[i])
+        similar_m = np.max(distances[:, :emb_dim], axis=1) < tolerance
+        similar_m1 = similar_m & (distances[:, emb_dim] < tolerance)
+        return(np.array([np.sum(similar_m), np.sum(similar_m1)]))
+
+    counts = np.array(_complexity_sampen_counts(signal[starts[0]:starts[0] + window], emb_dim, tolerance))
+    position = starts[0]
 
+    values = np.zeros(len(starts))
+    for index, start in enumerate(starts):
+        while position < start:
+            counts -= matches(position, position + 1, position + n_templates)
+            counts += matches(position + n_templates, position + 1, position + n_templates)
+            position += 1
+        values[index] = _complexity_entropy_sample(counts)
+    return(values)
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def complexity_entropy_shannon(signal, method=u"exact", bins=10, resolution=None):
+    u"""
+    Computes the shannon entropy. Based on the `pyEntropy <https://github.com/nikdon/pyEntropy>`_ repo by tjugo.
+
+    Parameters
+    ----------
+    signal : list, array or str
+        List or array of values. If 2D (channels × samples), one entropy is computed per row.
+    method : str
+        How values are turned into symbols. "exact" (default) uses every distinct value as a symbol. "binned" counts the values falling in `bins` equal-width bins spanning the range of each row. "quantized" rounds the values to the nearest multiple of `resolution`. For continuous signals (where nearly every value is unique), "binned" or "quantized" give a more meaningful estimate.
+    bins : int
+        Number of bins. Used by the "binned" method.
+    resolution : float
+        Quantization step, in the signal's units. Used by the "quantized" method.
 
     Returns
     ----------
-    shannon_entropy : float
-        The Shannon Entropy as float value.
+    shannon_entropy : float or array
+        The Shannon Entropy as float value (or an array with one value per row for 2D inputs).
 
 
     Example
@@ -279,17 +911,20 @@ def complexity_entropy_shannon(signal):
     >>>
     >>> signal = np.sin(np.log(np.random.sample(666)))
     >>> shannon_entropy = nk.complexity_entropy_shannon(signal)
+    >>> shannon_entropy = nk.complexity_entropy_shannon(signal, method="binned", bins=16)
 
     Notes
     ----------
     *Details*
 
     - **shannon entropy**: Entropy is a measure of unpredictability of the state, or equivalently, of its average information content.
+    - **counting**: Symbol frequencies are obtained by sorting each row once and measuring the length of the runs of equal values (or, in the "binned" mode, with a single bincount), so that the cost is O(n log n) (O(n) when binned) instead of O(n²) for continuous signals.
 
 
     *Authors*
 
     - tjugo (https://github.com/nikdon)
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
 
     *Dependencies*
 
@@ -303,29 +938,47 @@ def complexity_entropy_shannon(signal):
     -----------
     - None
     """
-     # Check if string
-    if not isinstance(signal, unicode):
+    # Check if string
+    if isinstance(signal, unicode):
         signal = list(signal)
 
-    signal = np.array(signal)
-
-
-    # Create a frequency data
-    data_set = list(set(signal))
-    freq_list = []
-    for entry in data_set:
-        counter = 0.
-        for i in signal:
-            if i == entry:
-                counter += 1
-        freq_list.append(float(counter) / len(signal))
+    signal = np.asarray(signal)
+    is_vector = signal.ndim == 1
+    signal = np.atleast_2d(signal)
+    n_rows, n_values = signal.shape
+
+    # Symbols
+    if method == u"quantized":
+        if resolution is None:
+            raise ValueError(u"NeuroKit error: complexity_entropy_shannon(): the 'quantized' method requires a resolution.")
+        signal = np.round(signal / float(resolution))
+
+    if method == u"binned":
+        low = np.min(signal, axis=1)[:, np.newaxis]
+        span = np.max(signal, axis=1)[:, np.newaxis] - low
+        span[span == 0] = 1
+        symbols = np.floor((signal - low) / span * bins).astype(int)
+        symbols = np.clip(symbols, 0, bins - 1)
+        counts = np.bincount((symbols + np.arange(n_rows)[:, np.newaxis] * bins).ravel(), minlength=n_rows * bins)
+        rows = np.repeat(np.arange(n_rows), bins)
+    elif method in [u"exact", u"quantized"]:
+        # Runs of equal values in each sorted row
+        ordered = np.sort(signal, axis=1)
+        starts = np.ones(ordered.shape, dtype=bool)
+        starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        starts = np.flatnonzero(starts)
+        counts = np.diff(np.append(starts, ordered.size))
+        rows = starts // n_values
+    else:
+        raise ValueError(u"NeuroKit error: complexity_entropy_shannon(): method should be 'exact', 'binned' or 'quantized'.")
 
     # Shannon entropy
-    shannon_entropy = 0.0
-    for freq in freq_list:
-        shannon_entropy += freq * np.log2(freq)
-    shannon_entropy = -shannon_entropy
+    freq = counts[counts > 0] / float(n_values)
+    rows = rows[counts > 0]
+    shannon_entropy = -np.bincount(rows, weights=freq * np.log2(freq), minlength=n_rows)
 
+    if is_vector:
+        shannon_entropy = shannon_entropy[0]
     return(shannon_entropy)
 
 
@@ -339,9 +992,9 @@ def complexity_entropy_shannon(signal):
 # ==============================================================================
 # ==============================================================================
 # ==============================================================================
-def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default"):
+def complexity_entropy_sample(signal, emb_dim=2, tolerance=u"default", distance=u"chebychev", backend=u"neurokit"):
     u"""
-    Computes the Multiscale Entropy. Copied from the `pyEntropy <https://github.com/nikdon/pyEntropy>`_ repo by tjugo. Uses sample entropy with 'chebychev' distance.
+    Computes the sample entropy (sampen) of a signal.
 
     Parameters
     ----------
@@ -351,11 +1004,169 @@ def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default"):
         The embedding dimension (*m*, the length of vectors to compare).
     tolerance : float
         Distance *r* threshold for two template vectors to be considered equal. Default is 0.2*std(signal).
+    distance : str
+        Distance between template vectors. Can be "chebychev" (the one used in the definition of sampen) or "euclidean".
+    backend : str
+        "neurokit" (default) counts the similar template vectors with a KD-tree neighbour search (O(n log n) on average). "nolds" uses the brute-force pairwise comparison of nolds (O(n²)). "compare" runs both, to check their parity and speed.
+
+    Returns
+    ----------
+    sample_entropy : float or dict
+        The sample entropy as float value. With backend="compare", a dict containing the sample entropy ("SampEn_neurokit" and "SampEn_nolds") and the duration in seconds ("Time_neurokit" and "Time_nolds") of each backend.
+
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>>
+    >>> signal = np.sin(np.log(np.random.sample(666)))
+    >>> sample_entropy = nk.complexity_entropy_sample(signal, emb_dim=2)
+    >>> comparison = nk.complexity_entropy_sample(signal, emb_dim=2, backend="compare")
+
+    Notes
+    ----------
+    *Details*
+
+    - **Sample entropy (sampen)**: Measures the complexity of a time-series, based on approximate entropy. The sample entropy of a time series is defined as the negative natural logarithm of the conditional probability that two sequences similar for emb_dim points remain similar at the next point, excluding self-matches. A lower value for the sample entropy therefore corresponds to a higher probability indicating more self-similarity.
+    - **backends**: Both backends use the same N-m template vectors for the m and m+1 counts and the same strict inequality (distance < tolerance), so that they agree up to floating point precision.
+
+    *Authors*
+
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
+    - Christopher Schölzel (https://github.com/CSchoel)
+
+    *Dependencies*
+
+    - scipy
+    - numpy
+    - nolds
+
+    *See Also*
+
+    - nolds package: https://github.com/CSchoel/nolds
+
+    References
+    -----------
+    - Richman, J. S., & Moorman, J. R. (2000). Physiological time-series analysis using approximate entropy and sample entropy. American Journal of Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    if tolerance == u"default":
+        tolerance = 0.2*np.std(signal)
+
+    if backend == u"compare":
+        comparison = {}
+        for name in [u"neurokit", u"nolds"]:
+            start = builtin_time.time()
+            comparison[u"SampEn_" + name] = complexity_entropy_sample(signal, emb_dim, tolerance, distance, backend=name)
+            comparison[u"Time_" + name] = builtin_time.time() - start
+        return(comparison)
+
+    if backend == u"nolds":
+        if distance == u"chebychev":  # nolds' default, whatever the way its version expects it
+            sample_entropy = nolds.sampen(signal, emb_dim, tolerance, debug_plot=False, plot_file=None)
+        else:
+            sample_entropy = nolds.sampen(signal, emb_dim, tolerance, dist=distance, debug_plot=False, plot_file=None)
+        return(sample_entropy)
+
+    if backend != u"neurokit":
+        raise ValueError(u"NeuroKit error: complexity_entropy_sample(): backend should be 'neurokit', 'nolds' or 'compare'.")
+
+    counts = _complexity_sampen_counts(signal, emb_dim, tolerance, distance)
+    sample_entropy = _complexity_entropy_sample(counts)
+    return(sample_entropy)
+
+
+
+def _complexity_entropy_sample(counts):
+    u"""
+    Sample entropy from the number of matches of length emb_dim and emb_dim+1.
+    """
+    matches_m, matches_m1 = counts
+    if matches_m1 == 0:
+        sample_entropy = np.inf
+    else:
+        sample_entropy = -np.log(matches_m1 / matches_m)
+    return(sample_entropy)
+
+
+
+def _complexity_sampen_counts(signal, emb_dim, tolerance, distance=u"chebychev", tree=None):
+    u"""
+    Number of pairs of similar template vectors of length emb_dim and emb_dim+1 (self-matches excluded). `tree` can provide the KD-tree of the emb_dim embedding (see _complexity_embedding_tree()).
+    """
+    templates = _embed_seq(signal, 1, emb_dim + 1)
+    if tolerance <= 0:
+        return([0, 0])
+
+    p = _complexity_minkowski_p(distance)
+    radius = np.nextafter(tolerance, -np.inf)  # cKDTree counts distance <= r, sampen uses distance < r
+
+    # Length emb_dim: the tree holds one more vector than the templates (the last one),
+    # whose 2 * k - 1 ordered pairs (k neighbours including itself) are removed
+    if tree is None:
+        tree = _complexity_embedding_tree(signal, emb_dim)
+    pairs = tree.count_neighbors(tree, radius, p=p)
+    pairs -= 2 * len(tree.query_ball_point(tree.data[-1], radius, p=p)) - 1
+    counts = [(pairs - len(templates)) / 2]
+
+    # Length emb_dim+1
+    tree = scipy.spatial.cKDTree(templates)
+    counts.append((tree.count_neighbors(tree, radius, p=p) - len(templates)) / 2)
+    return(counts)
+
+
+
+def _complexity_embedding_tree(signal, emb_dim):
+    u"""
+    KD-tree of the delay embedding (tau=1) of the signal. Shared by the sample entropy and the correlation dimension.
+    """
+    return(scipy.spatial.cKDTree(_embed_seq(np.asarray(signal, dtype=float), 1, emb_dim)))
+
+
+
+def _complexity_minkowski_p(distance):
+    u"""
+    Minkowski p-norm corresponding to a distance name.
+    """
+    if distance == u"chebychev":
+        return(np.inf)
+    if distance in [u"euclidean", u"euler"]:
+        return(2)
+    raise ValueError(u"NeuroKit error: complexity(): distance should be 'chebychev' or 'euclidean'.")
+
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default", scales=None, distance=u"chebychev"):
+    u"""
+    Computes the Multiscale Entropy (MSE) curve and its complexity index. Based on the `pyEntropy <https://github.com/nikdon/pyEntropy>`_ repo by tjugo.
+
+    Parameters
+    ----------
+    signal : list or array
+        List or array of values.
+    emb_dim : int
+        The embedding dimension (*m*, the length of vectors to compare) used for the sample entropy at each scale.
+    tolerance : float
+        Distance *r* threshold for two template vectors to be considered equal. Default is 0.2*std(signal). The same tolerance (computed on the original signal) is used at every scale.
+    scales : list or array
+        Scale factors at which to compute the sample entropy. Default is 1 to 20.
+    distance : str
+        Distance between template vectors. Can be "chebychev" or "euclidean".
 
     Returns
     ----------
-    multiscale_entropy : float
-        The Multiscale Entropy as float value.
+    mse : dict
+        Contains the scale factors ("MSE_Scales"), the sample entropy at each scale ("MSE_Values") and the complexity index, *i.e.* the area under the MSE curve ("MSE_AUC").
 
 
     Example
@@ -363,13 +1174,15 @@ def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default"):
     >>> import neurokit as nk
     >>>
     >>> signal = np.sin(np.log(np.random.sample(666)))
-    >>> multiscale_entropy = nk.complexity_entropy_multiscale(signal)
+    >>> mse = nk.complexity_entropy_multiscale(signal, scales=range(1, 11))
+    >>> mse["MSE_AUC"]
 
     Notes
     ----------
     *Details*
 
     - **multiscale entropy**: Entropy is a measure of unpredictability of the state, or equivalently, of its average information content. Multiscale entropy (MSE) analysis is a new method of measuring the complexity of finite length time series.
+    - **coarse-graining**: The coarse-grained series of all scales are obtained from a single cumulative sum of the signal. Scales at which the coarse-grained series is too short (or has no similar template vectors) return NaN (or infinity) and are not included in the area under the curve.
 
 
     *Authors*
@@ -380,6 +1193,7 @@ def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default"):
     *Dependencies*
 
     - numpy
+    - scipy
 
     *See Also*
 
@@ -390,35 +1204,275 @@ def complexity_entropy_multiscale(signal, emb_dim=2, tolerance=u"default"):
     - Richman, J. S., & Moorman, J. R. (2000). Physiological time-series analysis using approximate entropy and sample entropy. American Journal of Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
     - Costa, M., Goldberger, A. L., & Peng, C. K. (2005). Multiscale entropy analysis of biological signals. Physical review E, 71(2), 021906.
     """
+    signal = np.asarray(signal, dtype=float)
+
     if tolerance == u"default":
         tolerance = 0.2*np.std(signal)
 
-    n = len(signal)
-    mse = np.zeros((1, emb_dim))
+    if scales is None:
+        scales = np.arange(1, 21)
+    scales = np.asarray(scales, dtype=int)
 
-    for i in xrange(emb_dim):
+    values = _complexity_mse_values(signal, emb_dim, tolerance, scales, distance)
+    finite = np.isfinite(values)
+    mse = {u"MSE_Scales": scales,
+           u"MSE_Values": values,
+           u"MSE_AUC": np.trapz(values[finite], scales[finite])}
+    return(mse)
 
-        b = int(np.fix(n / (i + 1)))
-        temp_ts = [0] * int(b)
 
-        for j in xrange(b):
-            num = sum(signal[j * (i + 1): (j + 1) * (i + 1)])
-            den = i + 1
-            temp_ts[j] = float(num) / float(den)
-        # Replaced the sample entropy computation with nolds' one...
-#        se = sample_entropy(temp_ts, 1, tolerance)
 
-        try:
-            se = nolds.sampen(temp_ts, 1, tolerance, dist=u"euclidean", debug_plot=False, plot_file=None)
-        except:
-            se = nolds.sampen(temp_ts, 1, tolerance, dist=u"euler", debug_plot=False, plot_file=None)
+def _complexity_mse_values(signal, emb_dim, tolerance, scales, distance=u"chebychev", counts=None):
+    u"""
+    Sample entropy of the coarse-grained signal at each scale. `counts` can provide the already known template matches of some scales ({scale: [matches_m, matches_m1]}).
+    """
+    if counts is None:
+        counts = {}
+
+    # Coarse-graining: mean of consecutive non-overlapping windows of length scale
+    cumulative = np.concatenate([[0], np.cumsum(signal)])
+
+    values = np.full(len(scales), np.nan)
+    for index, scale in enumerate(scales):
+        n_points = len(signal) // scale
+        if n_points <= emb_dim + 1:
+            continue
+        if scale in counts:
+            matches_m, matches_m1 = counts[scale]
+        else:
+            coarse = np.diff(cumulative[0:n_points*scale+1:scale]) / scale
+            matches_m, matches_m1 = _complexity_sampen_counts(coarse, emb_dim, tolerance, distance)
+
+        if matches_m1 > 0:
+            values[index] = -np.log(matches_m1 / matches_m)
+        elif matches_m > 0:
+            values[index] = np.inf
+    return(values)
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def complexity_fd_correlation(signal, emb_dim=2, rvals=None, fit=u"RANSAC"):
+    u"""
+    Computes the correlation dimension (Grassberger-Procaccia algorithm) of a signal.
+
+    Parameters
+    ----------
+    signal : list or array
+        List or array of values.
+    emb_dim : int
+        The embedding dimension.
+    rvals : list or array
+        Radii at which to compute the correlation sum C(r). Default is a logarithmic range from 0.1*std(signal) to 0.5*std(signal) (factor 1.03 between successive values), as in nolds.
+    fit : str
+        Fitting method of the line to log(r) vs log(C(r)). Can be "RANSAC" (robust fitting, using sklearn) or "poly" (least squares).
+
+    Returns
+    ----------
+    fd_correlation : float
+        The correlation dimension as float value.
 
 
-        mse[0, i] = se
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>>
+    >>> signal = np.sin(np.log(np.random.sample(666)))
+    >>> fd_correlation = nk.complexity_fd_correlation(signal, 2)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Correlation dimension**: A measure of the fractal (or correlation) dimension of a time series which is also related to complexity. The correlation dimension is a characteristic measure that can be used to describe the geometry of chaotic attractors. It is defined using the correlation sum C(r) which is the fraction of pairs of points X_i in the phase space whose distance is smaller than r.
+    - **Computation**: The correlation sums at all radii are obtained from a single dual-tree traversal of a KD-tree of the embedded signal (instead of the full matrix of pairwise distances), so that the memory used grows linearly with the signal length. The definitions (Euclidean distance, strict inequality and normalization by n(n-1)) are those of nolds.
 
-    multiscale_entropy = mse[0][emb_dim-1]
 
-    return (multiscale_entropy)
+    *Authors*
+
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
+    - Christopher Schölzel (https://github.com/CSchoel)
+
+    *Dependencies*
+
+    - numpy
+    - scipy
+    - nolds
+
+    *See Also*
+
+    - nolds package: https://github.com/CSchoel/nolds
+
+    References
+    -----------
+    - Grassberger, P., & Procaccia, I. (1983). Measuring the strangeness of strange attractors. Physica D: Nonlinear Phenomena, 9(1-2), 189-208.
+    """
+    signal = np.asarray(signal, dtype=float)
+    tree = _complexity_embedding_tree(signal, emb_dim)
+    fd_correlation = _complexity_fd_correlation(tree, len(signal), np.std(signal), rvals=rvals, fit=fit)
+    return(fd_correlation)
+
+
+
+def _complexity_fd_correlation(tree, n, sd, rvals=None, fit=u"RANSAC"):
+    u"""
+    Correlation dimension from the KD-tree of the embedded signal (of length n and standard deviation sd).
+    """
+    if rvals is None:
+        rvals = 0.1 * sd * 1.03**np.arange(int(np.floor(np.log(5) / np.log(1.03))) + 1)
+    rvals = np.asarray(rvals, dtype=float)
+
+    # Correlation sums at all radii at once (cKDTree counts distance <= r, C(r) uses distance < r)
+    csums = tree.count_neighbors(tree, np.nextafter(rvals, -np.inf), p=2) / (n * (n - 1))
+
+    nonzero = csums != 0
+    if np.sum(nonzero) == 0:
+        return(np.nan)
+    fd_correlation = nolds.measures.poly_fit(np.log(rvals[nonzero]), np.log(csums[nonzero]), 1, fit=fit)[0]
+    return(fd_correlation)
+
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def complexity_dfa(signal, nvals=None, overlap=True, order=1, fit=u"RANSAC", ranges=None):
+    u"""
+    Computes the Detrended Fluctuation Analysis (DFA) scaling exponent of a signal.
+
+    Parameters
+    ----------
+    signal : list or array
+        List or array of values. If 2D (channels × samples), one exponent is computed per row.
+    nvals : list or array
+        Window sizes. Default is a logarithmic range from 4 to 0.1*len(signal) (factor 1.2 between successive values), as in nolds.
+    overlap : bool
+        Whether the windows overlap by half of their size.
+    order : int
+        Order of the polynomial trend removed from each window.
+    fit : str
+        Fitting method of the line to log(n) vs log(F(n)). Can be "RANSAC" (robust fitting, using sklearn) or "poly" (least squares).
+    ranges : dict
+        Several ranges of window sizes (e.g., {"DFA_1": range(4, 17), "DFA_2": range(16, 65)}), for which exponents are estimated from a single computation of the fluctuations. Overrides nvals.
+
+    Returns
+    ----------
+    dfa : float, array or dict
+        The DFA exponent as float value (or an array with one value per row for 2D inputs). If ranges is given, a dict containing the exponent of each range.
+
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>>
+    >>> signal = np.sin(np.log(np.random.sample(666)))
+    >>> dfa = nk.complexity_dfa(signal)
+    >>> alphas = nk.complexity_dfa(signal, ranges={"DFA_1": range(4, 17), "DFA_2": range(16, 65)})
+
+    Notes
+    ----------
+    *Details*
+
+    - **DFA**: DFA measures the Hurst parameter H, which is very similar to the Hurst exponent. The main difference is that DFA can be used for non-stationary processes (whose mean and/or variance change over time).
+    - **Computation**: The profile (cumulative sum of the deviations from the mean) is computed once. For each window size, the windows are strided views of the profile, detrended all at once by projecting them on an orthonormal basis of the polynomials of the given order (the closed-form least-squares fit). Windows and fluctuations are the same as in nolds.
+
+
+    *Authors*
+
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
+    - Christopher Schölzel (https://github.com/CSchoel)
+
+    *Dependencies*
+
+    - numpy
+    - nolds
+
+    *See Also*
+
+    - nolds package: https://github.com/CSchoel/nolds
+
+    References
+    -----------
+    - Peng, C. K., Havlin, S., Stanley, H. E., & Goldberger, A. L. (1995). Quantification of scaling exponents and crossover phenomena in nonstationary heartbeat time series. Chaos: An Interdisciplinary Journal of Nonlinear Science, 5(1), 82-87.
+    """
+    signal = np.asarray(signal, dtype=float)
+    is_vector = signal.ndim == 1
+    signal = np.atleast_2d(signal)
+    N = signal.shape[1]
+
+    if ranges is None:
+        if nvals is None:
+            nvals = nolds.measures.logarithmic_n(4, 0.1 * N, 1.2)
+        all_nvals = np.asarray(nvals, dtype=int)
+    else:
+        all_nvals = np.unique(np.concatenate([np.asarray(list(nvals), dtype=int) for nvals in ranges.values()]))
+    if np.min(all_nvals) < 2 or np.max(all_nvals) >= N:
+        raise ValueError(u"NeuroKit error: complexity_dfa(): window sizes should be between 2 and the length of the signal.")
+
+    fluctuations = _complexity_dfa_fluctuations(signal, all_nvals, overlap=overlap, order=order)
+
+    if ranges is None:
+        dfa = _complexity_dfa_fit(all_nvals, fluctuations, fit=fit)
+        if is_vector:
+            dfa = dfa[0]
+        return(dfa)
+
+    dfa = {}
+    for name, nvals in ranges.items():
+        selection = np.in1d(all_nvals, np.asarray(list(nvals), dtype=int))
+        dfa[name] = _complexity_dfa_fit(all_nvals[selection], fluctuations[:, selection], fit=fit)
+        if is_vector:
+            dfa[name] = dfa[name][0]
+    return(dfa)
+
+
+
+def _complexity_dfa_fluctuations(signal, nvals, overlap=True, order=1):
+    u"""
+    Mean fluctuation around the polynomial trend of the windows of each size (columns) of each row of a 2D signal.
+    """
+    walk = np.cumsum(signal - np.mean(signal, axis=1, keepdims=True), axis=1)
+    N = walk.shape[1]
+
+    fluctuations = np.zeros((len(walk), len(nvals)))
+    for index, n in enumerate(nvals):
+        if overlap:
+            windows = _embed_seq(walk, 1, n)[:, 0:N - n:n // 2]
+        else:
+            windows = walk[:, :N - (N % n)].reshape(len(walk), N // n, n)
+
+        # Least-squares polynomial trends, from an orthonormal basis of the polynomials of degree <= order
+        basis = np.linalg.qr(np.vander(np.arange(n, dtype=float), order + 1))[0]
+        residuals = windows - np.dot(np.dot(windows, basis), basis.T)
+        fluctuations[:, index] = np.mean(np.sqrt(np.mean(residuals**2, axis=2)), axis=1)
+    return(fluctuations)
+
+
+
+def _complexity_dfa_fit(nvals, fluctuations, fit=u"RANSAC"):
+    u"""
+    Slope of log(F(n)) against log(n) for each row of fluctuations, ignoring null fluctuations.
+    """
+    dfa = np.full(len(fluctuations), np.nan)
+    for row, values in enumerate(fluctuations):
+        nonzero = values != 0
+        if np.sum(nonzero) > 0:
+            dfa[row] = nolds.measures.poly_fit(np.log(nvals[nonzero]), np.log(values[nonzero]), 1, fit=fit)[0]
+    return(dfa)
+
 
 
 
@@ -437,14 +1491,14 @@ def complexity_fd_higushi(signal, k_max):
     Parameters
     ----------
     signal : list or array
-        List or array of values.
+        List or array of values. If 2D (channels × samples), one FD is computed per row.
     k_max : int
         The maximal value of k. The point at which the FD plateaus is considered a saturation point and that kmax value should be selected (Gómez, 2009). Some studies use a value of 8 or 16 for ECG signal and other 48 for MEG.
 
     Returns
     ----------
-    fd_higushi : float
-        The Higushi Fractal Dimension as float value.
+    fd_higushi : float or array
+        The Higushi Fractal Dimension as float value (or an array with one value per row for 2D inputs).
 
 
     Example
@@ -459,11 +1513,13 @@ def complexity_fd_higushi(signal, k_max):
     *Details*
 
     - **Higushi Fractal Dimension**: Higuchi proposed in 1988 an efficient algorithm for measuring the FD of discrete time sequences. As the reconstruction of the attractor phase space is not necessary, this algorithm is simpler and faster than D2 and other classical measures derived from chaos theory. FD can be used to quantify the complexity and self-similarity of a signal. HFD has already been used to analyse the complexity of brain recordings and other biological signals.
+    - **Computation**: For each k, the lengths of the k curves (one per offset m) are obtained at once from the absolute increments at lag k, weighted by the normalization factor of the curve they belong to. The FD is then the least-squares slope of log(L(k)) against log(1/k), fitted for all rows at once.
 
 
     *Authors*
 
     - Quentin Geissmann (https://github.com/qgeissmann)
+    - Dominique Makowski (https://github.com/DominiqueMakowski)
 
     *Dependencies*
 
@@ -478,33 +1534,52 @@ def complexity_fd_higushi(signal, k_max):
     - Accardo, A., Affinito, M., Carrozzi, M., & Bouquet, F. (1997). Use of the fractal dimension for the analysis of electroencephalographic time series. Biological cybernetics, 77(5), 339-350.
     - Gómez, C., Mediavilla, Á., Hornero, R., Abásolo, D., & Fernández, A. (2009). Use of the Higuchi's fractal dimension for the analysis of MEG recordings from Alzheimer's disease patients. Medical engineering & physics, 31(3), 306-313.
     """
-    signal = np.array(signal)
-    L = []
-    x = []
-    N = signal.size
+    signal = np.asarray(signal, dtype=float)
+    is_vector = signal.ndim == 1
+    signal = np.atleast_2d(signal)
+
+    weights = _complexity_higushi_weights(signal.shape[1], k_max)
+    fd_higushi = _complexity_fd_higushi(signal, weights)
+
+    if is_vector:
+        fd_higushi = fd_higushi[0]
+    return (fd_higushi)
 
-    km_idxs = np.triu_indices(k_max - 1)
-    km_idxs = k_max - np.flipud(np.column_stack(km_idxs)) -1
-    km_idxs[:,1] -= 1
 
 
+def _complexity_higushi_weights(N, k_max):
+    u"""
+    Normalization weight of each lag-k increment (k = 1 to k_max-1) in the Higuchi curve lengths of signals of length N.
+    """
+    weights = []
     for k in xrange(1, k_max):
-        Lk = 0
-        for m in xrange(0, k):
-            #we pregenerate all idxs
-            idxs = np.arange(1,int(np.floor((N-m)/k)))
+        # The increment at position p belongs to the curve of offset m = p % k, of which
+        # only the floor((N - m) / k) - 1 first increments are used
+        positions = np.arange(N - k)
+        m = positions % k
+        used = positions // k <= np.floor((N - m) / k) - 2
+        weights.append(np.where(used, (N - 1) / ((N - m) * k), 0))
+    return(weights)
 
-            Lmk = np.sum(np.abs(signal[m+idxs*k] - signal[m+k*(idxs-1)]))
-            Lmk = (Lmk*(N - 1)/(((N - m)/ k)* k)) / k
-            Lk += Lmk
 
-        if Lk != 0:
-            L.append(np.log(Lk/(m+1)))
-            x.append([np.log(1.0/ k), 1])
 
-    (p, r1, r2, s)=np.linalg.lstsq(x, L)
-    fd_higushi = p[0]
-    return (fd_higushi)
+def _complexity_fd_higushi(signal, weights):
+    u"""
+    Higuchi FD of each row of a 2D signal, given the increment weights of _complexity_higushi_weights().
+    """
+    k_values = np.arange(1, len(weights) + 1)
+    Lk = np.zeros((signal.shape[0], len(k_values)))
+    for index, k in enumerate(k_values):
+        Lk[:, index] = np.abs(signal[:, k:] - signal[:, :-k]).dot(weights[index])
+
+    # Least-squares slope of log(L(k)) against log(1/k), ignoring the null lengths
+    valid = Lk != 0
+    n_valid = valid.sum(axis=1)
+    x = np.where(valid, np.log(1.0 / k_values), 0)
+    L = np.where(valid, np.log(np.where(valid, Lk, 1) / k_values), 0)
+    x_centered = np.where(valid, x - (x.sum(axis=1) / n_valid)[:, np.newaxis], 0)
+    fd_higushi = (x_centered * L).sum(axis=1) / (x_centered**2).sum(axis=1)
+    return(fd_higushi)
 
 
 # ==============================================================================
@@ -526,7 +1601,7 @@ def complexity_entropy_spectral(signal, sampling_rate, bands=None):
     sampling_rate : int
         Sampling rate (samples/second).
     bands : int
-        A list of numbers delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
+        A list of numbers (in increasing order) delimiting the bins of the frequency bands. If None the entropy is computed over the whole range of the DFT (from 0 to `f_s/2`).
 
     Returns
     ----------
@@ -546,6 +1621,7 @@ def complexity_entropy_spectral(signal, sampling_rate, bands=None):
     *Details*
 
     - **Higushi Fractal Dimension**: Higuchi proposed in 1988 an efficient algorithm for measuring the FD of discrete time sequences. As the reconstruction of the attractor phase space is not necessary, this algorithm is simpler and faster than D2 and other classical measures derived from chaos theory. FD can be used to quantify the complexity and self-similarity of a signal. HFD has already been used to analyse the complexity of brain recordings and other biological signals.
+    - **Frequency bands**: The rfft bins being sorted, each band is a run of consecutive bins. The first bin of each band is found with a single searchsorted (cached for each signal length, sampling rate and bands), and the power of all bands is summed in one reduceat pass.
 
 
     *Authors*
@@ -560,25 +1636,54 @@ def complexity_entropy_spectral(signal, sampling_rate, bands=None):
 
     - pyrem package: https://github.com/gilestrolab/pyrem
     """
+    signal = np.asarray(signal, dtype=float)
 
     psd = np.abs(np.fft.rfft(signal))**2
-    psd /= np.sum(psd) # psd as a pdf (normalised to one)
+    band_starts = _complexity_spectral_bands(signal.size, sampling_rate, bands)
+    spectral = _complexity_entropy_spectral(psd, band_starts)
+    return(spectral)
 
+
+
+_spectral_bands_cache = {}
+
+def _complexity_spectral_bands(n_samples, sampling_rate, bands=None):
+    u"""
+    First rfft bin of each (non-empty) frequency band delimited by `bands`, for signals of n_samples. None if bands is None. Cached for each length, rate and bands.
+    """
     if bands is None:
-        power_per_band= psd[psd>0]
-    else:
-        freqs = np.fft.rfftfreq(signal.size, 1/float(sampling_rate))
-        bands = np.asarray(bands)
+        return(None)
+    bands = np.asarray(bands, dtype=float)
+    if np.any(np.diff(bands) < 0):  # Otherwise the bands overlap
+        raise ValueError(u"NeuroKit error: complexity_entropy_spectral(): bands should be in increasing order.")
 
-        freq_limits_low = np.concatenate([[0.0],bands])
-        freq_limits_up = np.concatenate([bands, [np.Inf]])
+    key = (n_samples, float(sampling_rate), bands.tobytes())
+    if key not in _spectral_bands_cache:
+        if len(_spectral_bands_cache) >= 128:
+            _spectral_bands_cache.clear()
 
-        power_per_band = [np.sum(psd[np.bitwise_and(freqs >= low, freqs<up)])
-                for low,up in izip(freq_limits_low, freq_limits_up)]
+        # The bins are sorted, so that each band [low, up) is a run of consecutive bins starting at the first bin >= low
+        freqs = np.fft.rfftfreq(n_samples, 1/float(sampling_rate))
+        band_starts = np.concatenate([[0], np.searchsorted(freqs, bands, side=u"left")])
+        band_starts = np.unique(band_starts[band_starts < len(freqs)])  # Empty bands have no power
+        _spectral_bands_cache[key] = band_starts
+    return(_spectral_bands_cache[key])
 
-        power_per_band= np.array(power_per_band)[np.array(power_per_band) > 0]
 
-    spectral = - np.sum(power_per_band * np.log2(power_per_band))
+
+def _complexity_entropy_spectral(psd, band_starts=None):
+    u"""
+    Spectral entropy of a power spectrum (along its last axis), pooled in frequency bands if band_starts (see _complexity_spectral_bands()) is given.
+    """
+    psd = psd / np.sum(psd, axis=-1, keepdims=True) # psd as a pdf (normalised to one)
+
+    if band_starts is None:
+        power_per_band = psd
+    else:
+        power_per_band = np.add.reduceat(psd, band_starts, axis=-1)
+
+    terms = power_per_band * np.log2(np.where(power_per_band > 0, power_per_band, 1))
+    spectral = - np.sum(terms, axis=-1)
     return(spectral)
 # ==============================================================================
 # ==============================================================================
@@ -589,8 +1694,11 @@ def complexity_entropy_spectral(signal, sampling_rate, bands=None):
 # ==============================================================================
 # ==============================================================================
 def _embed_seq(signal, tau, emb_dim):
-
-    N =len(signal)
+    u"""
+    Time-delay embedding of the signal (along its last axis), returned as a read-only strided view (no copy) of shape (..., N - (emb_dim - 1) * tau, emb_dim).
+    """
+    signal = np.asarray(signal)
+    N = signal.shape[-1]
 
     if emb_dim * tau > N:
         raise ValueError(u"Cannot build such a matrix, because D * Tau > N")
@@ -598,13 +1706,34 @@ def _embed_seq(signal, tau, emb_dim):
     if tau<1:
         raise ValueError(u"Tau has to be at least 1")
 
+    shape = signal.shape[:-1] + (N - (emb_dim - 1) * tau, emb_dim)
+    strides = signal.strides[:-1] + (signal.strides[-1], signal.strides[-1] * tau)
+    Y = np.lib.stride_tricks.as_strided(signal, shape=shape, strides=strides, writeable=False)
 
-    Y=np.zeros((emb_dim, N - (emb_dim - 1) * tau))
+    return(Y)
 
-    for i in xrange(emb_dim):
-        Y[i] = signal[i *tau : i*tau + Y.shape[1] ]
 
-    return(Y.T)
+
+def _complexity_singular_values(signal, tau=1, emb_dim=2):
+    u"""
+    Normalized singular values of the embedded signal. Shared by the SVD entropy and the Fisher information.
+    """
+    W = np.linalg.svd(_embed_seq(signal, tau, emb_dim), compute_uv = False)
+    W = W / np.sum(W, axis=-1, keepdims=True) # normalize singular values
+    return(W)
+
+
+
+def _complexity_entropy_svd(W):
+    entropy_svd = -1*np.sum(W * np.log2(W), axis=-1)
+    return(entropy_svd)
+
+
+
+def _complexity_fisher_info(W):
+    FI_v = (W[..., 1:] - W[..., :-1]) **2 / W[..., :-1]
+    fisher_info = np.sum(FI_v, axis=-1)
+    return(fisher_info)
 
 
 # ==============================================================================
@@ -659,10 +1788,8 @@ def complexity_entropy_svd(signal, tau=1, emb_dim=2):
 
     - pyrem package: https://github.com/gilestrolab/pyrem
     """
-    mat =  _embed_seq(signal, tau, emb_dim)
-    W = np.linalg.svd(mat, compute_uv = False)
-    W /= sum(W) # normalize singular values
-    entropy_svd = -1*sum(W * np.log2(W))
+    W = _complexity_singular_values(signal, tau, emb_dim)
+    entropy_svd = _complexity_entropy_svd(W)
     return(entropy_svd)
 
 
@@ -683,12 +1810,12 @@ def complexity_fd_petrosian(signal):
     Parameters
     ----------
     signal : list or array
-        List or array of values.
+        List or array of values. If 2D (channels × samples), one FD is computed per row.
 
     Returns
     ----------
-    fd_petrosian : float
-        The Petrosian FD as float value.
+    fd_petrosian : float or array
+        The Petrosian FD as float value (or an array with one value per row for 2D inputs).
 
 
     Example
@@ -716,13 +1843,14 @@ def complexity_fd_petrosian(signal):
 
     - pyrem package: https://github.com/gilestrolab/pyrem
     """
-    diff = np.diff(signal)
+    signal = np.asarray(signal, dtype=float)
+    diff = np.diff(signal, axis=-1)
     # x[i] * x[i-1] for i in t0 -> tmax
-    prod = diff[1:-1] * diff[0:-2]
+    prod = diff[..., 1:-1] * diff[..., 0:-2]
 
     # Number of sign changes in derivative of the signal
-    N_delta = np.sum(prod < 0)
-    n = len(signal)
+    N_delta = np.sum(prod < 0, axis=-1)
+    n = signal.shape[-1]
     fd_petrosian = np.log(n)/(np.log(n)+np.log(n/(n+0.4*N_delta)))
     return(fd_petrosian)
 
@@ -781,11 +1909,7 @@ def complexity_fisher_info(signal, tau=1, emb_dim=2):
     - pyrem package: https://github.com/gilestrolab/pyrem
     """
 
-    mat =  _embed_seq(signal, tau, emb_dim)
-    W = np.linalg.svd(mat, compute_uv = False)
-    W /= sum(W) # normalize singular values
-    FI_v = (W[1:] - W[:-1]) **2 / W[:-1]
-
-    fisher_info = np.sum(FI_v)
+    W = _complexity_singular_values(signal, tau, emb_dim)
+    fisher_info = _complexity_fisher_info(W)
     return(fisher_info)
 
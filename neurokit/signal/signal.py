@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import pandas as pd
 import numpy as np
 import scipy
+import scipy.signal
 
 
 
@@ -74,4 +75,316 @@ def discrete_to_continuous(values, value_times, sampling_rate=1000):
 
 def power_in_band(power, freq, band):
     power = np.trapz(y=power[(freq >= band[0]) & (freq < band[1])], x=freq[(freq >= band[0]) & (freq < band[1])])
-    return (power)
\ No newline at end of file
+    return (power)
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def band_envelopes(signal, sampling_rate, bands, order=1, decimate=1):
+    u"""
+    Amplitude envelopes of a signal in several frequency bands, computed from a single FFT.
+
+    Parameters
+    ----------
+    signal : list or array
+        Signal.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    bands : dict or list
+        Frequency bands, as [low, high] pairs (in Hz). A dict (e.g., {"LF": [0.04, 0.15]}) returns a dict of envelopes with the same keys.
+    order : int
+        Order of the Butterworth band-pass filters.
+    decimate : int
+        Returns the envelopes at sampling_rate/decimate. All the bands must lie below this rate.
+
+    Returns
+    ----------
+    envelopes : dict or ndarray
+        Amplitude envelope of each band (one row per band for a list of bands).
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> signal = np.sin(np.arange(0, 600, 0.25)*2*np.pi*0.1)
+    >>> envelopes = nk.band_envelopes(signal, 4, {"LF": [0.04, 0.15], "HF": [0.15, 0.4]}, decimate=2)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Filter bank**: Equivalent to filtering the signal with each (zero-phase, i.e., forward-backward) Butterworth band-pass filter and taking the modulus of its analytic signal (Hilbert transform). The spectrum of the signal (extended with its mirror image to reduce edge effects) is computed once, multiplied by the squared frequency response of all the filters (restricted to positive frequencies) and inverse-transformed at once. The envelopes can still differ from forward-backward filtering near the edges, or for bands whose period is close to the signal duration. With `decimate`, the inverse transforms are computed on the first sampling_rate/decimate Hz of the spectrum, directly giving decimated envelopes.
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+    - scipy
+    """
+    if isinstance(bands, dict):
+        names = list(bands.keys())
+        limits = [bands[name] for name in names]
+    else:
+        names = None
+        limits = bands
+
+    sampling_rate = float(sampling_rate)
+    if max([high for low, high in limits]) >= sampling_rate/decimate:
+        raise ValueError(u"NeuroKit error: band_envelopes(): the bands must lie below sampling_rate/decimate.")
+
+    # Extend the signal to a multiple of decimate, then with its mirror image (so that its periodic extension is continuous)
+    signal = np.asarray(signal, dtype=float)
+    n = len(signal)
+    n_decimated = -(-n // decimate)
+    signal = np.pad(signal, (0, n_decimated*decimate - n), mode=u"reflect")
+    signal = np.concatenate([signal, signal[::-1]])
+    spectrum = np.fft.fft(signal)
+
+    # Squared (forward-backward) response of each filter at the positive frequencies, doubled for the analytic signal
+    n_padded = len(signal)
+    positive = np.arange(n_padded//2 + 1)
+    gains = np.zeros((len(limits), n_padded))
+    for index, (low, high) in enumerate(limits):
+        b, a = scipy.signal.butter(order, [low/(sampling_rate/2), high/(sampling_rate/2)], btype=u"bandpass")
+        gains[index, positive] = np.abs(scipy.signal.freqz(b, a, worN=2*np.pi*positive/n_padded)[1])**2
+    gains[:, 1:(n_padded+1)//2] *= 2
+
+    # Inverse transforms (of the frequencies below sampling_rate/decimate when decimated)
+    n_kept = n_padded//decimate
+    analytic = np.fft.ifft(spectrum[:n_kept]*gains[:, :n_kept], axis=1)/decimate
+    envelopes = np.abs(analytic[:, :n_decimated])
+
+    if names is not None:
+        envelopes = dict(zip(names, envelopes))
+    return(envelopes)
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def psd_lombscargle(times, values, frequencies):
+    u"""
+    Lomb-Scargle power spectral density of unevenly sampled signals.
+
+    Parameters
+    ----------
+    times : list or array
+        Times (in seconds) of the samples. A 2D array (one row per signal, padded with NaNs) computes the spectrum of several signals at once.
+    values : list or array
+        Values of the samples (same shape as times).
+    frequencies : list or array
+        Frequencies (in Hz, strictly positive) at which the spectrum is evaluated.
+
+    Returns
+    ----------
+    power : array
+        One-sided power spectral density at each frequency (one row per signal for 2D inputs).
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> times = np.cumsum(np.random.uniform(0.6, 1, 300))
+    >>> values = np.sin(2*np.pi*0.1*times)
+    >>> power = nk.psd_lombscargle(times, values, np.arange(1, 501)*0.001)
+
+    Notes
+    ----------
+    *Details*
+
+    - **Lomb-Scargle**: Least-squares fit of a sinusoid at each frequency, which does not require the samples to be evenly spaced (Lomb, 1976; Scargle, 1982). The signal is centered beforehand, and the periodogram is scaled (by twice the duration divided by the number of samples) so that its integral approximates the variance of the signal. All the signals are computed at once from four sums over the samples (the sums of squared sines and cosines derive from the sum of cos(2*omega*t)), by blocks of frequencies so that the memory does not grow with the number of frequencies.
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+
+    References
+    -----------
+    - Lomb, N. R. (1976). Least-squares frequency analysis of unequally spaced data. Astrophysics and space science, 39(2), 447-462.
+    - Scargle, J. D. (1982). Studies in astronomical time series analysis. II-Statistical aspects of spectral analysis of unevenly spaced data. The Astrophysical Journal, 263, 835-853.
+    """
+    times = np.asarray(times, dtype=float)
+    single = times.ndim == 1
+    times = np.atleast_2d(times)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    omega = 2*np.pi*np.asarray(frequencies, dtype=float)
+
+    # Padding samples do not contribute to the sums
+    valid = ~(np.isnan(times) | np.isnan(values))
+    n = valid.sum(axis=1)
+    values = np.where(valid, values, 0)
+    values = np.where(valid, values - (values.sum(axis=1)/n)[:, np.newaxis], 0)
+    duration = np.nanmax(np.where(valid, times, np.nan), axis=1) - np.nanmin(np.where(valid, times, np.nan), axis=1)
+    times = np.where(valid, times, 0)
+
+    # Sums over the samples (for each signal and frequency), by blocks of frequencies of about 2**20 (signals x frequencies x samples) values
+    yc = np.zeros((len(times), len(omega)))
+    ys = np.zeros((len(times), len(omega)))
+    c2 = np.zeros((len(times), len(omega)))
+    cs = np.zeros((len(times), len(omega)))
+    step = max(1, 2**20 // times.size)
+    for start in xrange(0, len(omega), step):
+        block = slice(start, start + step)
+        phases = omega[np.newaxis, block, np.newaxis]*times[:, np.newaxis, :]
+        cosines = np.cos(phases)*valid[:, np.newaxis, :]
+        sines = np.sin(phases)*valid[:, np.newaxis, :]
+        yc[:, block] = np.einsum(u"sfn,sn->sf", cosines, values)
+        ys[:, block] = np.einsum(u"sfn,sn->sf", sines, values)
+        c2[:, block] = np.einsum(u"sfn,sfn->sf", cosines - sines, cosines + sines)  # Sum of cos(2*omega*t)
+        cs[:, block] = np.einsum(u"sfn,sfn->sf", cosines, sines)  # Half the sum of sin(2*omega*t)
+    cc = (n[:, np.newaxis] + c2)/2
+    ss = (n[:, np.newaxis] - c2)/2
+
+    # Time offset (omega*tau) making the sine and cosine terms orthogonal
+    offset = np.arctan2(2*cs, cc - ss)/2
+    cos_offset = np.cos(offset)
+    sin_offset = np.sin(offset)
+    yc, ys = cos_offset*yc + sin_offset*ys, cos_offset*ys - sin_offset*yc
+    cc, ss = cos_offset**2*cc + 2*cos_offset*sin_offset*cs + sin_offset**2*ss, sin_offset**2*cc - 2*cos_offset*sin_offset*cs + cos_offset**2*ss
+    power = (yc**2/cc + ys**2/ss)/2
+
+    power = power*2*(duration/n)[:, np.newaxis]
+    if single:
+        power = power[0]
+    return(power)
+
+
+
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+# ==============================================================================
+def _filter_fir_fft(b, signal, block_size):
+    u"""
+    Forward-backward filtering of a signal (array longer than 3*len(b)) by the FIR filter of taps b, as a convolution computed by FFTs of block_size samples. Returns the filtered signal, equal (within floating point precision) to scipy.signal.filtfilt(b, [1], signal), including the odd extension of its edges.
+    """
+    # Forward-backward filtering by b is a convolution by b*reversed(b). Its edges (which filtfilt odd-extends) only reach len(b)-1 samples beyond the signal
+    kernel = np.convolve(b, b[::-1])
+    half = len(b) - 1
+    extended = np.concatenate([2*signal[0] - signal[half:0:-1], signal, 2*signal[-1] - signal[-2:-half-2:-1]])
+
+    # Overlap-add: convolve blocks of the signal (one FFT of block_size samples each) and add their overlapping tails
+    n_fft = max(int(block_size), 2**int(np.ceil(np.log2(4*len(kernel)))))
+    step = n_fft - len(kernel) + 1
+    kernel_fft = np.fft.rfft(kernel, n_fft)
+    convolved = np.zeros(len(extended) + len(kernel) - 1)
+    for start in xrange(0, len(extended), step):
+        block = extended[start:start+step]
+        convolved[start:start+len(block)+len(kernel)-1] += np.fft.irfft(np.fft.rfft(block, n_fft)*kernel_fft, n_fft)[:len(block)+len(kernel)-1]
+
+    return(convolved[len(kernel)-1:len(kernel)-1+len(signal)])
+
+
+def filter_zerophase(signal, sampling_rate=1000, ftype=u"FIR", band=u"bandpass", order=300, frequency=[3, 45], method=u"auto", block_size=2**14):
+    u"""
+    Zero-phase (forward-backward) filtering, suited to long recordings.
+
+    Parameters
+    ----------
+    signal : list or array
+        Signal.
+    sampling_rate : int
+        Sampling rate (samples/second).
+    ftype : str
+        Can be Finite Impulse Response filter ("FIR"), Butterworth filter ("butter"), Chebyshev filters ("cheby1" and "cheby2"), Elliptic filter ("ellip") or Bessel filter ("bessel").
+    band : str
+        Band type, can be Low-pass filter ("lowpass"), High-pass filter ("highpass"), Band-pass filter ("bandpass"), Band-stop filter ("bandstop").
+    order : int
+        Filter order (number of taps for FIR filters, made odd).
+    frequency : int or list
+        Cutoff frequencies, format depends on type of band: "lowpass" or "bandpass": single frequency (int), "bandpass" or "bandstop": pair of frequencies (list).
+    method : str
+        "fft" (FFT overlap-add convolution, FIR only), "sos" (second-order sections, IIR only) or "filtfilt" (time-domain filtering by the transfer function coefficients, as biosppy's `filter_signal()`). "auto" (default) uses "fft" for FIR filters of more than 64 taps, "filtfilt" for shorter ones and "sos" for IIR filters.
+    block_size : int
+        Number of samples of each FFT with the "fft" method.
+
+    Returns
+    ----------
+    filtered : array
+        Filtered signal.
+
+    Example
+    ----------
+    >>> import neurokit as nk
+    >>> import numpy as np
+    >>>
+    >>> signal = np.random.normal(size=3600000)
+    >>> filtered = nk.filter_zerophase(signal, 1000, ftype="FIR", band="bandpass", order=300, frequency=[3, 45])
+
+    Notes
+    ----------
+    *Details*
+
+    - **Design**: Filters are designed as in biosppy's `get_filter()`: `firwin()` for FIR filters, and `iirfilter()` for IIR filters (as second-order sections with the "sos" method).
+    - **fft**: Forward-backward filtering by a FIR filter is equivalent to a single convolution by the filter convolved with its reverse. It is computed by FFT on blocks of `block_size` samples (overlap-add), so that the cost grows with log(block_size) rather than with the number of taps, and the memory of each FFT is bounded. The edges are extended as in `scipy.signal.filtfilt()` (odd extension), and the result matches it within floating point precision.
+    - **sos**: IIR filters are numerically unstable as transfer function coefficients beyond low orders (e.g., from order 8 for a 3-45 Hz Butterworth band-pass filter at 1000 Hz). Second-order sections (`scipy.signal.sosfiltfilt()`) remain stable up to about order 100, and match "filtfilt" (with the same edge padding) for low orders. Beyond, the gain of the filter itself cannot be represented.
+
+    *Authors*
+
+    - `Dominique Makowski <https://dominiquemakowski.github.io/>`_
+
+    *Dependencies*
+
+    - numpy
+    - scipy
+
+    *See Also*
+
+    - BioSPPY: https://github.com/PIA-Group/BioSPPy
+    """
+    signal = np.asarray(signal, dtype=float)
+    frequency = 2*np.asarray(frequency, dtype=float)/sampling_rate  # Normalized by the Nyquist frequency
+    order = int(order)
+
+    if method not in [u"auto", u"fft", u"sos", u"filtfilt"]:
+        raise ValueError(u"NeuroKit error: filter_zerophase(): method should be 'auto', 'fft', 'sos' or 'filtfilt'.")
+    if method == u"auto":
+        if ftype == u"FIR":
+            method = u"fft" if order > 64 else u"filtfilt"
+        else:
+            method = u"sos"
+    if (method == u"fft") != (ftype == u"FIR") and method != u"filtfilt":
+        raise ValueError(u"NeuroKit error: filter_zerophase(): the 'fft' method is for FIR filters, and the 'sos' method for IIR filters.")
+
+    # FIR
+    if ftype == u"FIR":
+        if order % 2 == 0:
+            order += 1
+        b = scipy.signal.firwin(numtaps=order, cutoff=frequency, pass_zero=band in [u"lowpass", u"bandstop"])
+        if method == u"fft" and len(signal) > 3*len(b):
+            return(_filter_fir_fft(b, signal, block_size))
+        return(scipy.signal.filtfilt(b, [1], signal))
+
+    # IIR
+    if method == u"sos":
+        sos = scipy.signal.iirfilter(N=order, Wn=frequency, btype=band, ftype=ftype, output=u"sos")
+        padlen = 3*(order*(2 if band in [u"bandpass", u"bandstop"] else 1) + 1)  # Same as filtfilt
+        return(scipy.signal.sosfiltfilt(sos, signal, padlen=padlen))
+    b, a = scipy.signal.iirfilter(N=order, Wn=frequency, btype=band, ftype=ftype, output=u"ba")
+    return(scipy.signal.filtfilt(b, a, signal))
@@ -43,6 +43,216 @@ def test_bio_process():
 
     assert len(bio) == 4
     return(bio)
+# ---------------
+def test_ecg_wave_detector():
+    rpeaks = np.array([100, 300, 500, 700])
+    ecg = np.zeros(800)
+    ecg[rpeaks] = 10
+    ecg[[170, 370, 570]] = 2  # T waves
+    ecg[[230, 430, 630]] = 1  # P waves
+    ecg[[280, 480, 680]] = -1  # Q waves
+
+    waves = nk.ecg_wave_detector(ecg, rpeaks)
+    assert waves[u"T_Waves"] == [170, 370, 570]
+    assert waves[u"P_Waves"] == [230, 430, 630]
+    assert waves[u"Q_Waves"] == [280, 480, 680]
+
+# ---------------
+def test_ecg_systole():
+    systole = nk.ecg_systole(np.zeros(25), [2, 10, 20], [5, 14])
+    assert systole.dtype == np.int8
+    assert list(np.flatnonzero(systole)) == [2, 3, 4, 10, 11, 12, 13, 20, 21, 22, 23, 24]
+
+    systoles = nk.ecg_systole(np.zeros(25), [2, 10, 20], [5, 14], output=u"intervals")
+    assert list(systoles[u"Systole_Onsets"]) == [2, 10, 20]
+    assert list(systoles[u"Systole_Offsets"]) == [5, 14, 25]
+
+# ---------------
+def test_ecg_load_quality_model():
+    model = nk.ecg_load_quality_model()
+    assert nk.ecg_load_quality_model(u"default") is model
+    assert nk.ecg_load_quality_model(nk.Path.materials() + u"heartbeat_classification.model") is model
+
+
+# ---------------
+def test_heartbeats():
+    np.random.seed(666)
+    signal = np.random.normal(size=5000)
+    rpeaks = [100, 900, 1700, 2500, 3300, 4100, 4900]
+
+    import biosppy
+    cardiac_cycles, extracted = biosppy.ecg.extract_heartbeats(signal=signal, rpeaks=rpeaks, sampling_rate=1000, before=0.2, after=0.4)
+    heartbeats = nk.Heartbeats(signal, rpeaks, sampling_rate=1000, before=0.2, after=0.4)
+    assert len(heartbeats) == 5
+    assert list(heartbeats.rpeaks) == list(extracted)
+    assert np.array_equal(np.array(heartbeats), cardiac_cycles)
+
+    assert np.shares_memory(heartbeats[0], signal)
+    assert heartbeats[0].flags.writeable is False
+    assert heartbeats.to_dataframe().shape == (600, 5)
+    assert heartbeats.to_dataframe().index[200] == 0
+
+    from neurokit.bio.bio_ecg import _ecg_quality_templates
+    assert np.allclose(_ecg_quality_templates(heartbeats, 1000), _ecg_quality_templates(heartbeats.to_dataframe(), 1000))
+
+# ---------------
+def test_ecg_quality_templates():
+    np.random.seed(666)
+    heartbeats = pd.DataFrame(np.cumsum(np.random.normal(size=(600, 5)), axis=0))
+    heartbeats.index = pd.date_range(u"2018-01-01", periods=600, freq=u"1L")
+
+    # Reference: former pandas preprocessing (1000 Hz, 600 ms heartbeats)
+    reference = heartbeats.rolling(20).mean().resample(u"3L").pad()
+    reference = reference.fillna(method=u"bfill").reset_index(drop=True)[8:200]
+    reference = np.array(nk.z_score(reference).T)
+
+    from neurokit.bio.bio_ecg import _ecg_quality_templates
+    templates = _ecg_quality_templates(heartbeats, 1000)
+    assert templates.shape == (5, 192)
+    assert np.allclose(templates, reference)
+
+    model = nk.ecg_load_quality_model()
+    assert list(model.predict(templates)) == list(model.predict(reference))
+
+
+# ---------------
+def test_sparse_signals():
+    signals = nk.SparseSignals(sampling_rate=100)
+    signals.add_signal(u"Signal", np.arange(10.))
+    signals.add_events(u"Events", [2, 5], 10)
+    signals.add_intervals(u"Intervals", [1, 6], [3, 8], 10)
+    signals.add_resampled(u"Resampled", [0., 1.], rate=50, start=2, length=3)
+    assert len(signals) == 10
+    assert list(signals[u"Events"].dropna().index) == [2, 5]
+    assert list(signals[u"Intervals"]) == [0, 1, 1, 0, 0, 0, 1, 1, 0, 0]
+    assert signals[u"Intervals"].dtype == np.int8
+    assert np.allclose(signals[u"Resampled"][2:5], [0, 0.5, 1])
+    assert signals[u"Resampled"].isnull().sum() == 7
+
+    np.random.seed(666)
+    ecg = np.zeros(20000)
+    rpeaks = np.cumsum(np.random.randint(700, 900, 22))
+    ecg[rpeaks] = 1
+    ecg = np.convolve(ecg, np.hanning(40), mode=u"same") + np.random.normal(0, 0.01, 20000)
+    dense = nk.ecg_preprocess(ecg, sampling_rate=1000)
+    sparse = nk.ecg_preprocess(ecg, sampling_rate=1000, output=u"sparse")
+    assert sparse[u"df"].keys() == list(dense[u"df"].columns)
+    assert np.allclose(sparse[u"df"].to_dataframe().values.astype(float), dense[u"df"].values.astype(float), equal_nan=True)
+
+    with pytest.raises(ValueError):
+        nk.ecg_preprocess(ecg, sampling_rate=1000, output=u"sprase")
+
+
+# ---------------
+def test_ecg_rr_artifacts():
+    np.random.seed(666)
+    RRis = np.random.normal(0.8, 0.05, size=500)
+    RRis[np.random.randint(0, 500, size=60)] *= np.random.choice([0.5, 0.7, 1.4, 2], size=60)
+
+    # Reference: former sequential detection of ecg_hrv()
+    reference = RRis.copy()
+    for index, rr in enumerate(reference):
+        if reference[index] < reference[index-1]*0.75:
+            reference[index] = np.nan
+        if reference[index] > reference[index-1]*1.25:
+            reference[index] = np.nan
+    reference[(reference < 0.6) | (reference > 1.3)] = np.nan
+
+    artifacts = nk.ecg_rr_artifacts(RRis)
+    assert artifacts.dtype == bool
+    assert np.array_equal(artifacts, np.isnan(reference))
+
+    artifacts = nk.ecg_rr_artifacts(RRis, strategies=[u"median"], window=5)
+    median = np.array([np.median(RRis[max(0, i-2):i+3]) for i in range(2, 498)])
+    assert np.array_equal(artifacts[2:498], np.abs(RRis[2:498] - median) > 0.25*median)
+
+    with pytest.raises(ValueError):
+        nk.ecg_rr_artifacts(RRis, strategies=[u"spline"])
+
+
+# ---------------
+def test_ecg_hrv_geometric():
+    from neurokit.bio.bio_ecg import _ecg_hrv_geometric
+    np.random.seed(666)
+    for scale in [5, 20, 50, 100, 300]:
+        RRi = np.random.normal(800, scale, size=3000)
+
+        # Reference: former search over all the numbers of bins
+        bin_number = 32
+        for bin_number_current in range(2, 50):
+            bin_width = np.diff(np.histogram(RRi, bins=bin_number_current, density=True)[1])[0]
+            if abs(8 - bin_width) < abs(8 - np.diff(np.histogram(RRi, bins=bin_number, density=True)[1])[0]):
+                bin_number = bin_number_current
+        density = np.histogram(RRi, bins=bin_number, density=True)[0]
+
+        geometric = _ecg_hrv_geometric(RRi, 100)
+        assert np.allclose(geometric[u"Triang"], 100/np.max(density))
+        assert np.allclose(geometric[u"Shannon_h"], nk.complexity_entropy_shannon(density))
+
+    hrv = nk.ecg_hrv(np.cumsum(np.random.normal(800, 30, size=300)).astype(int), hrv_features=[u"time"])
+    assert np.isfinite(hrv[u"Triang"])
+
+
+# ---------------
+def test_ecg_hrv_resample_rate():
+    np.random.seed(666)
+    beats = np.arange(200)
+    rpeaks = np.cumsum(212 + np.random.normal(0, 8, 200) + 15*np.sin(2*np.pi*0.1*beats) + 10*np.sin(2*np.pi*0.3*beats)).astype(int)
+    original = rpeaks.copy()
+
+    full = nk.ecg_hrv(rpeaks, sampling_rate=250, hrv_features=[u"frequency"], resample_rate=None, dense=True)
+    hrv = nk.ecg_hrv(rpeaks, sampling_rate=250, hrv_features=[u"frequency"], dense=True)
+    assert np.array_equal(rpeaks, original)
+    for index in [u"VLF", u"LF", u"HF", u"Total_Power", u"LF/HF"]:
+        assert np.allclose(hrv[index], full[index], rtol=0.01)
+
+    assert np.allclose(hrv[u"df"][u"ECG_RR_Interval"], full[u"df"][u"ECG_RR_Interval"])
+    middle = slice(len(full[u"df"])//5, 4*len(full[u"df"])//5)  # Away from the transients of the filters
+    for band in [u"ECG_HRV_LF", u"ECG_HRV_HF"]:
+        assert np.corrcoef(hrv[u"df"][band].values[middle], full[u"df"][band].values[middle])[0, 1] > 0.99
+    assert u"df" not in nk.ecg_hrv(rpeaks, sampling_rate=250, hrv_features=[u"frequency"])
+
+    # Geometrical indices do not depend on the interpolation
+    time = nk.ecg_hrv(rpeaks, sampling_rate=250, hrv_features=[u"time"])
+    for index in [u"Triang", u"Shannon_h"]:
+        assert hrv[index] == full[index] == time[index]
+
+
+# ---------------
+def test_ecg_hrv_lombscargle():
+    np.random.seed(666)
+    beats = np.arange(400)
+    rpeaks = np.cumsum(850 + np.random.normal(0, 40, 400) + 60*np.sin(2*np.pi*0.21*beats) + 80*np.sin(2*np.pi*0.085*beats)).astype(int)
+
+    multitaper = nk.ecg_hrv(rpeaks, hrv_features=[u"frequency"])
+    lombscargle = nk.ecg_hrv(rpeaks, hrv_features=[u"frequency"], psd_method=u"lombscargle")
+    for index in [u"LF", u"HF", u"Total_Power", u"LFn", u"HFn", u"LF/HF", u"LF/P", u"HF/P"]:
+        assert np.allclose(lombscargle[index], multitaper[index], rtol=0.1)
+
+
+# ---------------
+def test_ecg_hrv_tiers():
+    np.random.seed(666)
+    rpeaks = np.cumsum(850 + np.random.normal(0, 40, 300)).astype(int)
+
+    fast = nk.ecg_hrv(rpeaks, hrv_features=u"fast")
+    assert u"DFA_2" in fast.keys()
+    assert u"RMSSD" in fast.keys()
+    assert u"Sample_Entropy" not in fast.keys()
+    assert u"Lyapunov" not in fast.keys()
+
+    standard = nk.ecg_hrv(rpeaks, hrv_features=u"standard")
+    assert np.isclose(standard[u"Sample_Entropy"], nk.ecg_hrv(rpeaks, hrv_features=[u"nonlinear"])[u"Sample_Entropy"])
+    assert u"Correlation_Dimension" not in standard.keys()
+
+    budget = nk.ecg_hrv(rpeaks, hrv_features=[u"nonlinear"], time_budget=0)
+    assert np.isnan(budget[u"Lyapunov"])
+    assert np.isnan(budget[u"Entropy_Spectral_HF"])
+    assert budget[u"Status"][u"Correlation_Dimension"] == u"skipped"
+
+    with pytest.raises(ValueError):
+        nk.ecg_hrv(rpeaks, hrv_features=u"slow")
+
 
 if __name__ == u'__main__':
 #    nose.run(defaultTest=__name__)
@@ -0,0 +1,306 @@
+from __future__ import absolute_import
+import pytest
+import doctest
+import numpy as np
+import pandas as pd
+import neurokit as nk
+
+
+#==============================================================================
+# COMPLEXITY
+#==============================================================================
+def test_complexity_entropy_shannon():
+    signal = [1, 2, 2, 3, 3, 3, 4, 4, 4, 4]
+    assert np.round(nk.complexity_entropy_shannon(signal), 4) == 1.8464
+    assert nk.complexity_entropy_shannon(u"aabb") == 1.0
+
+    signals = np.array([signal, [5]*10])
+    entropies = nk.complexity_entropy_shannon(signals)
+    assert np.allclose(entropies, [nk.complexity_entropy_shannon(signal), 0])
+
+    binned = nk.complexity_entropy_shannon(np.random.normal(size=(3, 1000)), method=u"binned", bins=8)
+    assert len(binned) == 3
+    assert np.all(binned <= 3)
+
+    quantized = nk.complexity_entropy_shannon([0.1, 0.12, 0.9, 0.91], method=u"quantized", resolution=0.1)
+    assert quantized == 1.0
+
+
+def test_complexity_entropy_sample():
+    np.random.seed(666)
+    signal = np.cumsum(np.random.normal(size=2000))
+
+    # Parity with nolds
+    comparison = nk.complexity_entropy_sample(signal, emb_dim=2, backend=u"compare")
+    assert np.allclose(comparison[u"SampEn_neurokit"], comparison[u"SampEn_nolds"])
+    assert np.allclose(nk.complexity_entropy_sample(signal, emb_dim=2), comparison[u"SampEn_nolds"])
+
+    # Euclidean distance against brute-force counts
+    signal = signal[:300]
+    tolerance = 0.2*np.std(signal)
+    templates = np.array([signal[i:i+3] for i in range(len(signal)-2)])
+    counts = []
+    for m in [2, 3]:
+        distances = np.sqrt(((templates[:, np.newaxis, :m] - templates[np.newaxis, :, :m])**2).sum(axis=2))
+        counts.append((np.sum(distances < tolerance) - len(templates)) / 2.0)
+    sampen = nk.complexity_entropy_sample(signal, emb_dim=2, tolerance=tolerance, distance=u"euclidean")
+    assert np.allclose(sampen, -np.log(counts[1]/counts[0]))
+
+
+def test_complexity_entropy_multiscale():
+    np.random.seed(666)
+    signal = np.random.normal(size=1200)
+    tolerance = 0.2*np.std(signal)
+
+    mse = nk.complexity_entropy_multiscale(signal, emb_dim=2, scales=[1, 3, 5])
+    assert np.allclose(mse[u"MSE_Values"][0], nk.complexity_entropy_sample(signal, 2, tolerance))
+    coarse = signal.reshape(-1, 3).mean(axis=1)
+    assert np.allclose(mse[u"MSE_Values"][1], nk.complexity_entropy_sample(coarse, 2, tolerance))
+    assert np.allclose(mse[u"MSE_AUC"], np.trapz(mse[u"MSE_Values"], [1, 3, 5]))
+
+def test_complexity_entropy_spectral():
+    np.random.seed(666)
+    signal = np.random.normal(size=300)
+
+    # Reference: one mask per band
+    psd = np.abs(np.fft.rfft(signal))**2
+    psd /= np.sum(psd)
+    freqs = np.fft.rfftfreq(300, 1/4.0)
+    bands = np.arange(0.04, 0.15, 0.001)
+    power = np.array([np.sum(psd[(freqs >= low) & (freqs < up)]) for low, up in zip(np.append(0, bands), np.append(bands, np.inf))])
+    power = power[power > 0]
+    assert np.allclose(nk.complexity_entropy_spectral(signal, 4, bands=bands), -np.sum(power * np.log2(power)))
+
+    from neurokit.signal.complexity import _complexity_spectral_bands
+    assert _complexity_spectral_bands(300, 4, bands) is _complexity_spectral_bands(300, 4, bands)
+    with pytest.raises(ValueError):
+        nk.complexity_entropy_spectral(np.random.normal(size=300), 4, bands=[0.4, 0.15, 0.04])
+
+
+def test_complexity_entropy_svd():
+    np.random.seed(666)
+    signal = np.random.normal(size=500)
+
+    from neurokit.signal.complexity import _embed_seq
+    embedded = _embed_seq(signal, 2, 3)
+    assert embedded.shape == (496, 3)
+    assert embedded.flags.writeable is False
+    assert np.shares_memory(embedded, signal)
+
+    W = np.linalg.svd(np.array([signal[i:i+5:2] for i in range(496)]), compute_uv=False)
+    W /= W.sum()
+    assert np.allclose(nk.complexity_entropy_svd(signal, tau=2, emb_dim=3), -np.sum(W * np.log2(W)))
+    assert np.allclose(nk.complexity_fisher_info(signal, tau=2, emb_dim=3), np.sum((W[1:] - W[:-1])**2 / W[:-1]))
+
+
+def test_complexity_fd_correlation():
+    np.random.seed(666)
+    signal = np.cumsum(np.random.normal(size=600))
+
+    import nolds
+    assert np.allclose(nk.complexity_fd_correlation(signal, 2, fit=u"poly"), nolds.corr_dim(signal, 2, fit=u"poly"))
+    assert np.allclose(nk.complexity_fd_correlation(signal, 4, fit=u"poly"), nolds.corr_dim(signal, 4, fit=u"poly"))
+
+    plan = nk.ComplexityPlan(600, features=[u"sampen", u"correlation"])
+    assert plan.intermediates == [u"tolerance", u"embedding_tree", u"sampen_counts"]
+    assert np.allclose(plan.compute(signal)[u"Entropy_Sample"], nolds.sampen(signal, 2, 0.2*np.std(signal)))
+
+
+def test_complexity_dfa():
+    np.random.seed(666)
+    signals = np.cumsum(np.random.normal(size=(2, 800)), axis=1)
+
+    import nolds
+    for overlap in [True, False]:
+        dfa = nk.complexity_dfa(signals, overlap=overlap, order=2, fit=u"poly")
+        assert np.allclose(dfa, [nolds.dfa(signal, overlap=overlap, order=2, fit_exp=u"poly") for signal in signals])
+
+    dfa = nk.complexity_dfa(signals[0], ranges={u"DFA_1": range(4, 17), u"DFA_2": range(16, 65)}, fit=u"poly")
+    assert np.allclose(dfa[u"DFA_1"], nolds.dfa(signals[0], range(4, 17), fit_exp=u"poly"))
+    assert np.allclose(dfa[u"DFA_2"], nolds.dfa(signals[0], range(16, 65), fit_exp=u"poly"))
+
+
+def test_complexity_fd_higushi():
+    np.random.seed(666)
+    signals = np.cumsum(np.random.normal(size=(3, 503)), axis=1)
+
+    # Reference: curve lengths computed offset by offset
+    N = signals.shape[1]
+    x = []
+    L = []
+    for k in range(1, 10):
+        Lk = 0
+        for m in range(k):
+            idxs = np.arange(1, int(np.floor((N - m) / float(k))))
+            Lk += np.sum(np.abs(signals[0, m+idxs*k] - signals[0, m+k*(idxs-1)])) * (N - 1) / (((N - m) / float(k)) * k) / k
+        x.append(np.log(1.0 / k))
+        L.append(np.log(Lk / k))
+    reference = np.polyfit(x, L, 1)[0]
+
+    fd = nk.complexity_fd_higushi(signals, 10)
+    assert len(fd) == 3
+    assert np.allclose(fd[0], reference)
+    assert np.allclose(fd[1], nk.complexity_fd_higushi(signals[1], 10))
+
+
+def test_complexity_plan():
+    np.random.seed(666)
+    signals = np.cumsum(np.random.normal(size=(3, 400)), axis=1)
+
+    plan = nk.ComplexityPlan(400, features=[u"sampen", u"multiscale", u"spectral", u"svd", u"fisher", u"higushi"], bands=[5, 50])
+    assert plan.intermediates == [u"tolerance", u"embedding_tree", u"sampen_counts", u"psd", u"singular_values"]
+
+    for signal in signals:
+        complexity = plan.compute(signal)
+        assert np.allclose(complexity[u"Entropy_Sample"], nk.complexity_entropy_sample(signal))
+        assert np.allclose(complexity[u"Entropy_Multiscale_AUC"], nk.complexity_entropy_multiscale(signal)[u"MSE_AUC"])
+        assert np.allclose(complexity[u"Entropy_Spectral"], nk.complexity_entropy_spectral(signal, 1000, bands=[5, 50]))
+        assert np.allclose(complexity[u"Entropy_SVD"], nk.complexity_entropy_svd(signal))
+        assert np.allclose(complexity[u"Fisher_Information"], nk.complexity_fisher_info(signal))
+        assert np.allclose(complexity[u"Fractal_Dimension_Higushi"], nk.complexity_fd_higushi(signal, 8))
+
+    with pytest.raises(ValueError):
+        plan.compute(signals[0][:100])
+
+
+def test_complexity_pool():
+    np.random.seed(666)
+    signal = np.cumsum(np.random.normal(size=500))
+    features = dict(shannon=False, multiscale=False, spectral=False, svd=False, correlation=False, higushi=False, petrosian=False, fisher=False)
+
+    serial = nk.complexity(signal, **features)
+    pooled = nk.complexity(signal, n_jobs=2, **features)
+    assert pooled[u"Status"] == {}
+    for key in serial:
+        assert np.allclose(serial[key], pooled[key])
+
+    timed_out = nk.complexity(signal, n_jobs=2, time_budget={u"dfa": 0}, backend=u"nolds", **features)  # In-package DFA is not pooled
+    assert np.isnan(timed_out[u"DFA"])
+    assert timed_out[u"Status"] == {u"DFA": u"timeout"}
+    assert np.allclose(timed_out[u"Hurst"], serial[u"Hurst"])
+
+    defaults = nk.complexity(signal, n_jobs=2, time_budget={u"hurst": 60, u"default": 0}, backend=u"nolds", **features)
+    assert defaults[u"Status"] == {u"DFA": u"timeout"}
+
+    with pytest.raises(ValueError):
+        nk.complexity(signal, time_budget=10)
+
+    import multiprocessing
+    pool = multiprocessing.Pool(2)
+    plan = nk.ComplexityPlan(len(signal), features=[u"sampen", u"hurst"])
+    for repetition in range(2):  # The pool is reused, and left open
+        shared = plan.compute(signal, pool=pool, time_budget=60)
+        assert shared[u"Status"] == {}
+        assert np.allclose(shared[u"Hurst"], serial[u"Hurst"])
+    assert np.allclose(nk.complexity(signal, pool=pool, **features)[u"Hurst"], serial[u"Hurst"])
+    pool.close()
+    pool.join()
+
+
+def test_complexity_batch():
+    np.random.seed(666)
+    signals = np.cumsum(np.random.normal(size=(4, 400)), axis=1)
+    features = dict(correlation=False, hurst=False, dfa=False, bands=[5, 50])
+
+    complexity = nk.complexity_batch(signals, **features)
+    assert complexity.shape == (4, 8)
+    for row, signal in enumerate(signals):
+        expected = nk.complexity(signal, **features)
+        for key in expected:
+            assert np.allclose(complexity[key][row], expected[key])
+
+    channels = pd.DataFrame(signals.T, columns=[u"Fz", u"Cz", u"Pz", u"Oz"])
+    complexity = nk.complexity_batch(channels, axis=0, sampen=False, multiscale=False, **features)
+    assert list(complexity.index) == [u"Fz", u"Cz", u"Pz", u"Oz"]
+    assert np.allclose(complexity[u"Fractal_Dimension_Petrosian"], nk.complexity_fd_petrosian(signals))
+
+
+def test_complexity_rolling():
+    np.random.seed(666)
+    signal = np.round(np.cumsum(np.random.normal(size=1000)), 1)
+    tolerance = 0.2*np.std(signal)
+
+    for step in [1, 5, 100]:
+        complexity = nk.complexity_rolling(signal, window=400, step=step, bands=[10, 100])
+        assert list(complexity.index) == list(range(0, 601, step))
+        for start in complexity.index[::20]:
+            window = signal[start:start+400]
+            assert np.allclose(complexity[u"Entropy_Shannon"][start], nk.complexity_entropy_shannon(window))
+            assert np.allclose(complexity[u"Entropy_Sample"][start], nk.complexity_entropy_sample(window, 2, tolerance))
+            assert np.allclose(complexity[u"Entropy_Spectral"][start], nk.complexity_entropy_spectral(window, 1000, bands=[10, 100]))
+            assert np.allclose(complexity[u"Fractal_Dimension_Petrosian"][start], nk.complexity_fd_petrosian(window))
+
+    complexity = nk.complexity_rolling(signal, window=400, step=300, features=[u"svd"])
+    assert np.allclose(complexity[u"Entropy_SVD"], [nk.complexity_entropy_svd(signal[start:start+400]) for start in [0, 300, 600]])
+
+
+#==============================================================================
+# SIGNAL
+#==============================================================================
+def test_band_envelopes():
+    np.random.seed(666)
+    time = np.arange(0, 600, 0.25)
+    signal = 800 + 30*np.sin(2*np.pi*0.1*time) + 20*np.sin(2*np.pi*0.25*time) + np.cumsum(np.random.normal(size=len(time)))
+    bands = {u"LF": [0.04, 0.15], u"HF": [0.15, 0.4]}
+
+    # Reference: forward-backward filtering and Hilbert transform, band by band
+    import biosppy
+    envelopes = nk.band_envelopes(signal, 4, bands)
+    middle = slice(480, 1920)
+    for band in bands:
+        filtered = biosppy.signals.tools.filter_signal(signal=signal, ftype=u"butter", band=u"bandpass", order=1, frequency=bands[band], sampling_rate=4)[0]
+        reference = biosppy.signals.tools.analytic_signal(filtered)[0]
+        assert np.allclose(envelopes[band][middle], reference[middle], rtol=0.01)
+
+    decimated = nk.band_envelopes(signal, 4, [bands[u"LF"], bands[u"HF"]], decimate=4)
+    assert decimated.shape == (2, 600)
+    assert np.allclose(decimated[0][120:480], envelopes[u"LF"][::4][120:480], rtol=0.01)
+
+    with pytest.raises(ValueError):
+        nk.band_envelopes(signal, 4, bands, decimate=16)
+
+
+def test_psd_lombscargle():
+    np.random.seed(666)
+    times = np.cumsum(np.random.uniform(0.6, 1, 400))
+    values = 3*np.sin(2*np.pi*0.1*times) + np.random.normal(size=400)
+    frequencies = np.arange(1, 1001)*0.0005
+
+    import scipy.signal
+    power = nk.psd_lombscargle(times, values, frequencies)
+    reference = scipy.signal.lombscargle(times, values - np.mean(values), 2*np.pi*frequencies)
+    assert np.allclose(power, reference*2*(times[-1] - times[0])/400)
+    assert np.allclose(np.trapz(power, frequencies), np.var(values), rtol=0.05)
+
+    padded = np.full((2, 400), np.nan)
+    padded[0], padded[1, :300] = times, times[:300]
+    padded_values = np.full((2, 400), np.nan)
+    padded_values[0], padded_values[1, :300] = values, values[:300]
+    batch = nk.psd_lombscargle(padded, padded_values, frequencies)
+    assert np.allclose(batch[0], power)
+    assert np.allclose(batch[1], nk.psd_lombscargle(times[:300], values[:300], frequencies))
+
+
+def test_filter_zerophase():
+    np.random.seed(666)
+    signal = np.cumsum(np.random.normal(size=20000))
+
+    import scipy.signal
+    b = scipy.signal.firwin(numtaps=301, cutoff=[0.006, 0.09], pass_zero=False)
+    reference = scipy.signal.filtfilt(b, [1], signal)
+    assert np.allclose(nk.filter_zerophase(signal, 1000, u"FIR", u"bandpass", 300, [3, 45], block_size=2048), reference)
+    assert np.allclose(nk.filter_zerophase(signal, 1000, u"FIR", u"bandpass", 300, [3, 45], method=u"filtfilt"), reference)
+
+    b, a = scipy.signal.butter(2, [0.006, 0.09], btype=u"bandpass")
+    assert np.allclose(nk.filter_zerophase(signal, 1000, u"butter", u"bandpass", 2, [3, 45]), scipy.signal.filtfilt(b, a, signal))
+    assert np.all(np.isfinite(nk.filter_zerophase(signal, 1000, u"butter", u"bandpass", 20, [3, 45])))
+
+    with pytest.raises(ValueError):
+        nk.filter_zerophase(signal, 1000, u"butter", method=u"fft")
+    with pytest.raises(ValueError):
+        nk.filter_zerophase(signal, 1000, u"butter", method=u"fast")
+
+
+if __name__ == u'__main__':
+    pytest.main()
+    doctest.testmod()